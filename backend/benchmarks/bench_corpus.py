@@ -0,0 +1,95 @@
+"""
+Compiled Corpus Benchmark
+Loading a catalog of textbooks from JSON (before) vs opening compiled corpora with mmap (after)
+
+Run from the backend directory:
+    python -m benchmarks.bench_corpus
+"""
+
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from services.corpus import compile_corpus, open_corpus
+from services.textbook_index import TextbookIndex, get_textbook_index
+
+TEXTBOOKS = 200
+CHAPTERS = 10
+SECTIONS_PER_CHAPTER = 5
+WORDS_PER_SECTION = 400
+VOCABULARY = [f"term{n}" for n in range(3000)]
+
+
+def synthetic_textbook(number, rng):
+    return {
+        "title": f"Synthetic Textbook {number}",
+        "author": "Benchmark",
+        "isbn": f"000-{number:04d}",
+        "edition": "1st Edition",
+        "chapters": [
+            {
+                "number": chapter,
+                "title": f"Chapter Topic {chapter}",
+                "sections": [
+                    {
+                        "title": " ".join(rng.sample(VOCABULARY, 3)),
+                        "content": " ".join(rng.choice(VOCABULARY) for _ in range(WORDS_PER_SECTION)),
+                        "key_terms": rng.sample(VOCABULARY, 4),
+                        "page": chapter * 20 + section,
+                    }
+                    for section in range(SECTIONS_PER_CHAPTER)
+                ],
+            }
+            for chapter in range(1, CHAPTERS + 1)
+        ],
+    }
+
+
+def measure(label, load):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:34s} {seconds * 1000:9.1f} ms  {peak / 1e6:8.1f} MB Python heap")
+    return result
+
+
+def main():
+    rng = random.Random(5)
+    question = [{"id": "q", "text": " ".join(rng.sample(VOCABULARY, 6)), "topics": []}]
+    with tempfile.TemporaryDirectory() as directory:
+        json_paths, corpus_paths = [], []
+        for number in range(TEXTBOOKS):
+            textbook = synthetic_textbook(number, rng)
+            json_path = os.path.join(directory, f"{number}.json")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(textbook, f)
+            json_paths.append(json_path)
+            corpus_paths.append(compile_corpus(textbook, os.path.join(directory, f"{number}.acorpus")))
+        print(f"{TEXTBOOKS} textbooks, {CHAPTERS * SECTIONS_PER_CHAPTER} sections each")
+
+        def load_json():
+            textbooks = []
+            for path in json_paths:
+                with open(path, "r", encoding="utf-8") as f:
+                    textbooks.append(json.load(f))
+            return textbooks
+
+        def open_mapped():
+            return [open_corpus(path) for path in corpus_paths]
+
+        dicts = measure("before: load every JSON textbook", load_json)
+        mapped = measure("after: mmap every compiled corpus", open_mapped)
+
+        measure("before: first rank (builds BM25)", lambda: TextbookIndex(dicts[0]).rank(question))
+        measure("after: first rank (prebuilt)", lambda: get_textbook_index(mapped[0]).rank(question))
+        assert TextbookIndex(dicts[0]).rank(question) == get_textbook_index(mapped[0]).rank(question)
+
+
+if __name__ == "__main__":
+    main()
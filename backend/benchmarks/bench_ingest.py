@@ -0,0 +1,76 @@
+"""
+Textbook Ingestion Benchmark
+Page extraction and segmentation of a synthetic 1,000-page textbook, serial vs process pool
+
+Run from the backend directory:
+    python -m benchmarks.bench_ingest
+"""
+
+import os
+import random
+import resource
+import tempfile
+import time
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from services.textbook_ingest import INGEST_WORKERS, TextbookSegmenter, iter_page_texts
+
+PAGES = 1000
+PAGES_PER_CHAPTER = 50
+PAGES_PER_SECTION = 5
+VOCABULARY = ("wave function operator eigenvalue momentum energy spin potential lattice "
+              "entropy boundary kernel gradient tensor vector matrix field orbital").split()
+
+
+def synthetic_textbook(path, pages=PAGES, seed=3):
+    """Write a PDF with "Chapter N" and "N.M Title" headings and filler text"""
+    rng = random.Random(seed)
+    pdf = canvas.Canvas(path, pagesize=A4)
+    for page in range(pages):
+        chapter = page // PAGES_PER_CHAPTER + 1
+        y = 800
+        if page % PAGES_PER_CHAPTER == 0:
+            pdf.drawString(72, y, f"Chapter {chapter} Topic {chapter}")
+            y -= 24
+        if page % PAGES_PER_SECTION == 0:
+            section = page % PAGES_PER_CHAPTER // PAGES_PER_SECTION + 1
+            pdf.drawString(72, y, f"{chapter}.{section} Section {rng.choice(VOCABULARY).title()} {section}")
+            y -= 24
+        while y > 80:
+            pdf.drawString(72, y, " ".join(rng.choice(VOCABULARY) for _ in range(12)))
+            y -= 14
+        pdf.drawString(290, 40, str(page + 1))
+        pdf.showPage()
+    pdf.save()
+
+
+def ingest(path, workers):
+    segmenter = TextbookSegmenter("Synthetic Textbook")
+    for page_number, text in iter_page_texts(path, workers=workers):
+        segmenter.feed(page_number, text)
+    return segmenter.finish()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "textbook.pdf")
+        synthetic_textbook(path)
+        print(f"{PAGES} pages, {os.path.getsize(path) / 1e6:.1f} MB")
+
+        pool_workers = max(2, INGEST_WORKERS)
+        for label, workers in (("serial", 1), (f"{pool_workers} workers", pool_workers)):
+            start = time.perf_counter()
+            textbook = ingest(path, workers)
+            seconds = time.perf_counter() - start
+            sections = sum(len(chapter["sections"]) for chapter in textbook["chapters"])
+            print(f"{label:12s} {seconds:7.2f} s  {PAGES / seconds:7.1f} pages/s  "
+                  f"{len(textbook['chapters'])} chapters, {sections} sections")
+
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(f"peak RSS of this process: {peak_kb / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
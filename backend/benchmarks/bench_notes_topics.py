@@ -0,0 +1,48 @@
+"""
+Topic-Scoped Notes Benchmark
+Building notes for a few topics of a bank versus the whole book
+
+Run from the backend directory:
+    python -m benchmarks.bench_notes_topics
+"""
+
+import random
+import time
+
+from benchmarks.bench_corpus import synthetic_textbook, VOCABULARY
+from services.notes_generator import generate_notes_book
+from services.question_banks import QuestionBank
+from services.resolution_cache import resolution_cache
+
+QUESTIONS = 300
+TOPICS = [f"Topic {n}" for n in range(20)]
+SCOPES = (None, TOPICS[:1], TOPICS[:2], TOPICS[:5])
+SETTINGS = {"include_citations": True, "smart_highlights": True, "dark_export": False}
+
+
+def synthetic_questions(rng):
+    return [{"id": f"q{n}", "text": " ".join(rng.sample(VOCABULARY, 10)),
+             "topics": [rng.choice(TOPICS)], "frequency": 1}
+            for n in range(QUESTIONS)]
+
+
+def main():
+    rng = random.Random(5)
+    textbook = synthetic_textbook(0, rng)
+    bank = QuestionBank("bench", synthetic_questions(rng))
+
+    for topics in SCOPES:
+        resolution_cache.clear()
+        start = time.perf_counter()
+        questions = bank.topic_questions(topics) if topics else bank.questions
+        rankings = resolution_cache.rank(textbook, questions)
+        result = generate_notes_book("Bench", questions, textbook, topics, SETTINGS,
+                                     parallel_chapters=False, in_memory=True, rankings=rankings)
+        seconds = time.perf_counter() - start
+        label = f"{len(topics)} topics" if topics else "all topics"
+        print(f"{label:10s}  {len(questions):4d} questions  {result['total_pages']:4d} pages"
+              f"  {seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
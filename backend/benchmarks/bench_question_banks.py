@@ -0,0 +1,41 @@
+"""
+Question Bank Benchmark
+Cost of adding a small upload to a loaded bank versus rebuilding its indexes
+
+Run from the backend directory:
+    python -m benchmarks.bench_question_banks
+"""
+
+import time
+
+from benchmarks.bench_question_clusters import synthetic_bank
+from services.question_banks import QuestionBank
+from services.question_clusters import with_computed_frequencies
+from services.question_flags import classify_questions
+
+BANK_SIZES = (1000, 4000)
+UPLOAD_SIZE = 50
+
+
+def main():
+    for size in BANK_SIZES:
+        questions = synthetic_bank(size + UPLOAD_SIZE)
+        existing, upload = questions[:size], questions[size:]
+        bank = QuestionBank("bench", existing)
+        bank.questions  # settle the initial annotations
+
+        start = time.perf_counter()
+        for question in upload:
+            bank.add(question)
+        bank.questions
+        incremental_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        classify_questions(with_computed_frequencies(list(questions)))
+        rebuild_seconds = time.perf_counter() - start
+        print(f"{size:6d} questions + {UPLOAD_SIZE}  incremental {incremental_seconds * 1000:8.1f} ms"
+              f"  rebuild {rebuild_seconds * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Question Clustering Benchmark
+Near-duplicate clustering cost and quality for synthetic question banks of growing size
+
+The uniform bank draws from 5,000 words, so unrelated questions rarely share one. The
+topical bank draws 6 words from a Zipf-distributed 400-word vocabulary, like a subject's
+past papers where a few terms appear in most questions; it is the one that exposes
+chaining and overfull LSH buckets.
+
+Run from the backend directory:
+    python -m benchmarks.bench_question_clusters
+"""
+
+import random
+import time
+
+from services.question_clusters import QuestionClusterIndex, jaccard, question_shingles, SIMILARITY_THRESHOLD
+
+BANK_SIZES = (500, 2000, 8000)
+PAIRWISE_LIMIT = 2000  # the all-pairs baseline is skipped above this size
+VOCABULARY = [f"term{n}" for n in range(5000)]
+TOPICAL_VOCABULARY = [f"topic{n}" for n in range(400)]
+TOPICAL_WEIGHTS = [1 / rank for rank in range(1, len(TOPICAL_VOCABULARY) + 1)]
+TOPICAL_WORDS = 6
+
+
+def synthetic_bank(size, seed=7):
+    """Questions of 8-12 content words, a third of them lightly reworded copies"""
+    rng = random.Random(seed)
+    bank = []
+    for n in range(size):
+        if bank and n % 3 == 0:
+            source = bank[rng.randrange(len(bank))]
+            words = source["text"].split()
+            words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+        else:
+            source, words = None, rng.sample(VOCABULARY, rng.randint(8, 12))
+        bank.append({"id": f"q{n}", "text": " ".join(words), "topics": [],
+                     "source": source["id"] if source else None})
+    return bank
+
+
+def topical_bank(size, seed=7):
+    """Questions of 6 Zipf-distributed words, a third of them one-word rewordings"""
+    rng = random.Random(seed)
+    bank = []
+    for n in range(size):
+        if bank and n % 3 == 0:
+            source = bank[rng.randrange(len(bank))]
+            words = source["text"].split()
+            words[rng.randrange(len(words))] = rng.choice(TOPICAL_VOCABULARY)
+        else:
+            source, words = None, set()
+            while len(words) < TOPICAL_WORDS:
+                words.add(rng.choices(TOPICAL_VOCABULARY, TOPICAL_WEIGHTS)[0])
+            words = list(words)
+        bank.append({"id": f"q{n}", "text": " ".join(words), "topics": [],
+                     "source": source["id"] if source else None})
+    return bank
+
+
+def pairwise_clusters(bank):
+    """Baseline: compare every pair of questions"""
+    shingles = [question_shingles(question) for question in bank]
+    return sum(1 for i in range(len(bank)) for j in range(i)
+               if jaccard(shingles[i], shingles[j]) >= SIMILARITY_THRESHOLD)
+
+
+def main():
+    for label, make_bank in (("uniform", synthetic_bank), ("topical", topical_bank)):
+        for size in BANK_SIZES:
+            bank = make_bank(size)
+
+            start = time.perf_counter()
+            index = QuestionClusterIndex().add_many(bank)
+            lsh_seconds = time.perf_counter() - start
+            copies = [question for question in bank if question["source"]]
+            found = sum(1 for question in copies
+                        if index.cluster_id(question["id"]) == index.cluster_id(question["source"]))
+            largest = max((len(members) for members in index.clusters()), default=1)
+            line = (f"{label:7s} {size:6d} questions  lsh {lsh_seconds * 1000:9.1f} ms"
+                    f"  ({len(index.clusters())} clusters, largest {largest},"
+                    f" {found / len(copies):.0%} of rewordings with their source)")
+
+            if size <= PAIRWISE_LIMIT:
+                start = time.perf_counter()
+                pairwise_clusters(bank)
+                line += f"  all-pairs {(time.perf_counter() - start) * 1000:9.1f} ms"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
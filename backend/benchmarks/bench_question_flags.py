@@ -0,0 +1,63 @@
+"""
+Question Classification Benchmark
+Badge lookups for a large question bank: id lists (before) vs one flags pass (after)
+
+Run from the backend directory:
+    python -m benchmarks.bench_question_flags
+"""
+
+import random
+import time
+
+from services.question_flags import classify_questions, BUCKET_FREQUENT
+
+BANK_SIZE = 100_000
+LIST_LOOKUP_LIMIT = 10_000  # the list-membership baseline is quadratic; larger sizes take minutes
+
+
+def synthetic_bank(size, seed=11):
+    rng = random.Random(seed)
+    return [{"id": f"q{n}", "frequency": rng.randint(1, 5), "weightage": rng.choice((2, 5, 10, 15))}
+            for n in range(size)]
+
+
+def list_lookups(questions):
+    """Old behaviour: id lists and `in` membership tests per question"""
+    repeated = [q['id'] for q in questions if q.get('frequency', 0) >= 3]
+    high_weightage = [q['id'] for q in questions if q.get('weightage', 0) >= 10]
+    badges = 0
+    for q in questions:
+        badges += (q['id'] in repeated) + (q['id'] in high_weightage) + (q.get('frequency', 0) >= 4)
+    return len(repeated), len(high_weightage), badges
+
+
+def flag_lookups(questions):
+    """New behaviour: classify once, then read each question's flags by position"""
+    flags = classify_questions(questions)
+    badges = 0
+    for position in range(len(questions)):
+        badges += (flags.is_repeated(position) + flags.is_high_weightage(position)
+                   + (flags.bucket(position) == BUCKET_FREQUENT))
+    return flags.repeated, flags.high_weightage, badges
+
+
+def timed(func, questions):
+    start = time.perf_counter()
+    result = func(questions)
+    return result, time.perf_counter() - start
+
+
+def main():
+    for size in (1_000, LIST_LOOKUP_LIMIT, BANK_SIZE):
+        questions = synthetic_bank(size)
+        after, after_seconds = timed(flag_lookups, questions)
+        line = f"{size:7d} questions  flags {after_seconds * 1000:9.1f} ms"
+        if size <= LIST_LOOKUP_LIMIT:
+            before, before_seconds = timed(list_lookups, questions)
+            assert before == after
+            line += f"  id lists {before_seconds * 1000:9.1f} ms"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
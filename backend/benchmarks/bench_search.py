@@ -0,0 +1,72 @@
+"""
+Textbook Search Benchmark
+Query latency over a catalog of compiled corpora, against a linear scan of the section text
+
+Run from the backend directory:
+    python -m benchmarks.bench_search
+"""
+
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_corpus import synthetic_textbook, VOCABULARY
+from services.corpus import compile_corpus, open_corpus
+from services.search import search_textbook
+from services.textbook_index import tokenize
+
+TEXTBOOKS = 200
+QUERIES = 500
+SCAN_QUERIES = 20
+
+
+def scan_search(textbook, query):
+    """Baseline: tokenize every section and count query words"""
+    terms = set(tokenize(query))
+    hits = []
+    for chapter in textbook["chapters"]:
+        for section in chapter["sections"]:
+            count = sum(1 for token in tokenize(section["content"]) if token in terms)
+            if count:
+                hits.append((count, section["title"]))
+    return sorted(hits, reverse=True)[:10]
+
+
+def main():
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as directory:
+        corpora = []
+        for number in range(TEXTBOOKS):
+            path = compile_corpus(synthetic_textbook(number, rng), os.path.join(directory, f"{number}.acorpus"))
+            corpora.append(open_corpus(path))
+        queries = [(rng.choice(corpora), " ".join(rng.sample(VOCABULARY, 3))) for _ in range(QUERIES)]
+        phrase_queries = []
+        for _ in range(QUERIES):
+            corpus = rng.choice(corpora)
+            words = rng.choice(corpus.section_list)["content"].split()
+            start = rng.randrange(len(words) - 1)
+            phrase_queries.append((corpus, f'"{words[start]} {words[start + 1]}"'))
+
+        for label, batch in (("terms", queries), ("phrases", phrase_queries)):
+            latencies = []
+            for corpus, query in batch:
+                start = time.perf_counter()
+                search_textbook(corpus, query)
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            print(f"{TEXTBOOKS} textbooks, {label:7s}  p50 {latencies[len(latencies) // 2] * 1000:6.2f} ms"
+                  f"  p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.2f} ms")
+
+        latencies = []
+        for corpus, query in queries[:SCAN_QUERIES]:
+            textbook = corpus.to_dict()
+            start = time.perf_counter()
+            scan_search(textbook, query)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"{TEXTBOOKS} textbooks, scan     p50 {latencies[len(latencies) // 2] * 1000:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Style Setup Microbenchmark
+Per-request stylesheet cost before (fresh styles per build) and after (shared registry)
+
+Run from the backend directory:
+    python -m benchmarks.bench_styles
+"""
+
+import timeit
+
+from services.pdf_styles import PdfTheme, get_theme
+
+ITERATIONS = 2000
+
+
+def per_request_rebuild():
+    """Old behaviour: every build created its own stylesheet and styles"""
+    return PdfTheme(dark=False)
+
+
+def shared_registry():
+    """New behaviour: every build reuses the process-wide theme"""
+    return get_theme(False)
+
+
+def main():
+    get_theme(False)  # warm the registry, as the first request of a process would
+    for label, func in (("before (rebuild per request)", per_request_rebuild),
+                        ("after (shared registry)", shared_registry)):
+        seconds = timeit.timeit(func, number=ITERATIONS)
+        print(f"{label:30s} {seconds / ITERATIONS * 1e6:10.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
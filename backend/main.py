@@ -1,17 +1,66 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
+import hashlib
+import io
 import os
-from datetime import datetime
+import tempfile
+import time
+import uuid
+import zipfile
 
+from services import answer_key_generator, notes_generator
 from services.answer_key_generator import generate_answer_key
 from services.notes_generator import generate_notes_book
+from services.worker_pool import generation_pool, PoolSaturatedError, WorkerCrashedError
+from services.jobs import job_manager, JobLimitError
+from services.pdf_cache import pdf_cache, generation_key, PdfCache
+from services.storage import output_storage
+from services.single_flight import SingleFlight
+from services.downloads import (
+    file_etag, key_etag, etag_matches, is_immutable, parse_range, iter_file_range,
+    RangeNotSatisfiable, IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL
+)
+from services.subjects import subject_registry, register_textbook, UnknownSubjectError
+from services.question_banks import bank_format, ingest_question_bank, QuestionBankError
+from services.uploads import MultipartStream, BodyPipe, multipart_boundary, UploadError
+from services.search import search_textbook, SearchQueryError, DEFAULT_LIMIT
+from services.resolution_cache import resolution_cache
+from services.textbook_index import get_textbook_index
+from services.batches import (
+    BatchEntry, BatchError, plan_batch, batch_key, run_batch, throughput, write_archive,
+    BATCH_CONCURRENCY
+)
+from services.textbook_ingest import (
+    ingest_textbook, textbook_id_for, load_summary, load_textbook, list_textbooks, TEXTBOOK_DIR
+)
 from data.demo_textbook import get_demo_textbook, get_demo_questions
 
 app = FastAPI(title="AcadIntel Backend API", version="1.0.0")
 
+# Identical builds that arrive together share one render
+inflight_builds = SingleFlight()
+
+@app.on_event("startup")
+async def start_storage_sweeper():
+    output_storage.start()
+
+@app.on_event("startup")
+async def register_ingested_textbooks():
+    for summary in list_textbooks():
+        register_textbook(subject_registry, summary)
+
+@app.on_event("shutdown")
+async def shutdown_worker_pool():
+    job_manager.shutdown()
+    generation_pool.shutdown()
+    output_storage.stop()
+    pdf_cache.flush()
+
 # CORS configuration for frontend - MUST be added FIRST before any routes
 app.add_middleware(
     CORSMiddleware,
@@ -41,6 +90,8 @@ class AnswerKeyRequest(BaseModel):
     include_citations: bool = True
     smart_highlights: bool = True
     dark_export: bool = False
+    dedupe_answers: bool = False
+    stream_pdf: bool = False
 
 class NotesRequest(BaseModel):
     subject_id: Optional[str] = None
@@ -49,6 +100,26 @@ class NotesRequest(BaseModel):
     include_citations: bool = True
     smart_highlights: bool = True
     dark_export: bool = False
+    parallel_chapters: Optional[bool] = None
+    stream_pdf: bool = False
+
+class BundleRequest(BaseModel):
+    subject_id: Optional[str] = None
+    subject_name: Optional[str] = None
+    topics: Optional[List[str]] = None
+    include_citations: bool = True
+    smart_highlights: bool = True
+    dark_export: bool = False
+    dedupe_answers: bool = False
+    parallel_chapters: Optional[bool] = None
+    parallel_builds: bool = True
+    archive: bool = False
+
+class BatchRequest(BaseModel):
+    subjects: List[str]
+    kinds: List[str] = ["answer-key", "notes"]
+    variants: List[dict] = [{}]
+    concurrency: Optional[int] = None
 
 class GenerationResponse(BaseModel):
     success: bool
@@ -66,10 +137,225 @@ async def root():
         "endpoints": {
             "generate_answer_key": "/api/generate/answer-key",
             "generate_notes": "/api/generate/notes",
+            "generate_bundle": "/api/generate/bundle",
+            "batches": "/api/batches",
+            "submit_job": "/api/jobs/{answer-key|notes}",
+            "job_status": "/api/jobs/{job_id}",
+            "subjects": "/api/subjects",
+            "search": "/api/search?subject={subject}&q={query}",
             "demo_data": "/api/demo/textbook"
         }
     }
 
+@app.get("/api/pool")
+async def get_pool_status():
+    """Report generation worker pool usage"""
+    return generation_pool.stats()
+
+@app.get("/api/storage")
+async def get_storage_status():
+    """Report generated PDF storage usage and retention limits"""
+    return output_storage.stats()
+
+@app.get("/api/subjects")
+async def get_subjects():
+    """List the subjects that can be generated and the loaded-subject cache"""
+    return {"subjects": subject_registry.subjects(), "cache": subject_registry.stats()}
+
+@app.get("/api/cache")
+async def get_cache_status():
+    """Report generated PDF cache usage and request coalescing"""
+    return dict(pdf_cache.stats(), single_flight=inflight_builds.stats(),
+                resolution=resolution_cache.stats())
+
+def build_settings(request):
+    """Rendering settings shared by both generators"""
+    return {
+        "include_citations": request.include_citations,
+        "smart_highlights": request.smart_highlights,
+        "dark_export": request.dark_export
+    }
+
+def load_subject(subject_id, subject_name):
+    """Loaded data of a subject (by id, else by name); 404 if unknown
+
+    A cold subject is read from disk here, so async endpoints call this (and the
+    *_kwargs builders) through run_in_threadpool.
+    """
+    try:
+        return subject_registry.get(subject_id, subject_name)
+    except UnknownSubjectError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+def normalize_topics(topics):
+    """Order- and case-insensitive, duplicate-free topic filter (None means all topics)"""
+    cleaned = sorted({topic.strip().lower() for topic in topics or [] if topic.strip()})
+    return cleaned or None
+
+def subject_kwargs(request, topics=None, subject=None):
+    """Load the subject and resolve its questions once: the arguments both generators share
+
+    topics (normalized) takes only the questions tagged with them from the bank's
+    topic index, so only those are resolved and sent to a worker. subject is an
+    already loaded subject, if the caller has one.
+    """
+    subject = subject or load_subject(request.subject_id, request.subject_name)
+    if topics:
+        questions = subject.bank.topic_questions(topics)
+        if not questions:
+            raise HTTPException(status_code=404, detail=f"No questions tagged with: {', '.join(topics)}")
+    else:
+        questions = subject.questions
+    return {
+        # The canonical subject name keeps cache and in-flight keys shared across spellings
+        "subject_name": subject.subject.name,
+        # A bank snapshot: its fingerprint stands in for the questions in cache keys
+        "questions": questions,
+        "textbook": subject.textbook,
+        # Resolved here so every worker process shares one cache
+        "rankings": resolution_cache.rank(subject.textbook, questions)
+    }
+
+def answer_key_kwargs(request, shared=None):
+    """Load subject data and build generate_answer_key arguments"""
+    return dict(
+        shared or subject_kwargs(request),
+        settings=dict(build_settings(request), dedupe_answers=request.dedupe_answers)
+    )
+
+def answer_key_response(result):
+    """Wrap a generate_answer_key result for the API"""
+    return GenerationResponse(
+        success=True,
+        file_path=result["file_path"],
+        filename=result["filename"],
+        message="Answer key generated successfully",
+        metadata={
+            "total_questions": result["total_questions"],
+            "repeated_questions": result["repeated_questions"],
+            "high_weightage": result["high_weightage"],
+            "deduplicated_answers": result.get("deduplicated_answers", 0),
+            "frequency_buckets": result.get("frequency_buckets", {}),
+            "sources_used": result["sources_used"],
+            "generation_time": result["generation_time"],
+            "cached": result.get("cached", False)
+        }
+    )
+
+def notes_kwargs(request, shared=None):
+    """Load subject data and build generate_notes_book arguments
+
+    shared, if given, must already be limited to the request's topics.
+    A selection with no question matching any textbook section is rejected (422)
+    rather than rendered as an empty book.
+    """
+    topics = normalize_topics(request.topics)
+    shared = shared or subject_kwargs(request, topics)
+    index = get_textbook_index(shared["textbook"])
+    if not any(index.best_section(ranking) for ranking in shared["rankings"]):
+        raise HTTPException(status_code=422, detail="None of the selected questions match a textbook section")
+    return dict(
+        shared,
+        topics=topics,
+        settings=build_settings(request),
+        parallel_chapters=request.parallel_chapters
+    )
+
+def bundle_kwargs(request):
+    """generate_answer_key and generate_notes_book arguments from one load and resolution pass
+
+    Returns (answer key kwargs, notes kwargs, reason the notes were skipped). When the
+    topics leave the notes nothing to cover (the 404/422 of the notes endpoint) the
+    notes kwargs are None: the answer key does not depend on them and is still built.
+    """
+    subject = load_subject(request.subject_id, request.subject_name)
+    shared = subject_kwargs(request, subject=subject)
+    answer_kwargs = answer_key_kwargs(request, shared)
+    topics = normalize_topics(request.topics)
+    try:
+        notes_shared = subject_kwargs(request, topics, subject) if topics else shared
+        return answer_kwargs, notes_kwargs(request, notes_shared), None
+    except HTTPException as e:
+        if e.status_code not in (404, 422):
+            raise
+        return answer_kwargs, None, e.detail
+
+def notes_response(result):
+    """Wrap a generate_notes_book result for the API"""
+    return GenerationResponse(
+        success=True,
+        file_path=result["file_path"],
+        filename=result["filename"],
+        message="Notes generated successfully",
+        metadata={
+            "total_chapters": result["total_chapters"],
+            "total_topics": result["total_topics"],
+            "total_pages": result["total_pages"],
+            "chapter_mode": result.get("chapter_mode", "in_place"),
+            "sources_used": result["sources_used"],
+            "generation_time": result["generation_time"],
+            "cached": result.get("cached", False)
+        }
+    )
+
+def prepare_cached_build(kind, kwargs):
+    """Look up a build in the PDF cache; on a miss, pin the content-addressed filename"""
+    if kind == "answer-key":
+        version, prefix = answer_key_generator.GENERATOR_VERSION, "AnswerKey"
+    else:
+        version, prefix = notes_generator.GENERATOR_VERSION, "StudyNotes"
+    key = generation_key(kind, version, kwargs)
+    cached = pdf_cache.get(key)
+    if cached is None:
+        kwargs = dict(kwargs, filename=PdfCache.filename_for(prefix, kwargs["subject_name"], key))
+    return key, kwargs, cached
+
+async def run_cached(kind, func, kwargs):
+    """Return a cached PDF for identical inputs or build it on the worker pool
+
+    Concurrent requests with the same key wait on a single build.
+    """
+    key, kwargs, cached = prepare_cached_build(kind, kwargs)
+    if cached is not None:
+        return cached
+
+    async def build():
+        result = await generation_pool.run(func, **kwargs)
+        pdf_cache.put(key, result)
+        return result
+
+    return await inflight_builds.do(key, build)
+
+async def render_in_memory(kind, func, kwargs):
+    """(filename, path, pdf_bytes): the cached file's path, or the PDF rendered into memory"""
+    key, kwargs, cached = prepare_cached_build(kind, kwargs)
+    if cached is not None:
+        return cached["filename"], output_storage.path(cached["filename"]), None
+
+    async def build():
+        return await generation_pool.run(func, in_memory=True, **kwargs)
+
+    result = await inflight_builds.do(("in-memory", key), build)
+    return result["filename"], None, result["pdf_bytes"]
+
+async def stream_build(kind, func, kwargs):
+    """Build straight into memory and return the PDF as the response body
+
+    A PDF already in the cache is sent from disk; otherwise nothing is written to
+    output/ and the client needs no second request to /api/download.
+    """
+    filename, path, pdf_bytes = await render_in_memory(kind, func, kwargs)
+    if path is not None:
+        return FileResponse(path=path, filename=filename, media_type="application/pdf")
+    return Response(
+        content=pdf_bytes,
+        media_type="application/pdf",
+        headers={
+            "Content-Length": str(len(pdf_bytes)),
+            "Content-Disposition": f'attachment; filename="{filename}"'
+        }
+    )
+
 @app.post("/api/generate/answer-key")
 async def create_answer_key(request: AnswerKeyRequest):
     """
@@ -80,38 +366,15 @@ async def create_answer_key(request: AnswerKeyRequest):
     - Source references
     - External links if needed
     """
+    kwargs = await run_in_threadpool(answer_key_kwargs, request)
     try:
-        # Get demo questions for the subject
-        questions = get_demo_questions(request.subject_name)
-        
-        # Get demo textbook content
-        textbook = get_demo_textbook(request.subject_name)
-        
-        # Generate answer key PDF
-        result = generate_answer_key(
-            subject_name=request.subject_name,
-            questions=questions,
-            textbook=textbook,
-            settings={
-                "include_citations": request.include_citations,
-                "smart_highlights": request.smart_highlights,
-                "dark_export": request.dark_export
-            }
-        )
-        
-        return GenerationResponse(
-            success=True,
-            file_path=result["file_path"],
-            filename=result["filename"],
-            message="Answer key generated successfully",
-            metadata={
-                "total_questions": result["total_questions"],
-                "repeated_questions": result["repeated_questions"],
-                "high_weightage": result["high_weightage"],
-                "sources_used": result["sources_used"],
-                "generation_time": result["generation_time"]
-            }
-        )
+        if request.stream_pdf:
+            return await stream_build("answer-key", generate_answer_key, kwargs)
+        # Generate answer key PDF on the worker pool
+        result = await run_cached("answer-key", generate_answer_key, kwargs)
+        return answer_key_response(result)
+    except (PoolSaturatedError, WorkerCrashedError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating answer key: {str(e)}")
 
@@ -124,52 +387,510 @@ async def create_notes(request: NotesRequest):
     - Chapter-wise organization
     - Exam-oriented flow
     """
+    kwargs = await run_in_threadpool(notes_kwargs, request)
     try:
-        # Get demo questions for the subject
-        questions = get_demo_questions(request.subject_name)
-        
-        # Get demo textbook content
-        textbook = get_demo_textbook(request.subject_name)
-        
-        # Generate notes/mini-book PDF
-        result = generate_notes_book(
-            subject_name=request.subject_name,
-            questions=questions,
-            textbook=textbook,
-            topics=request.topics,
-            settings={
-                "include_citations": request.include_citations,
-                "smart_highlights": request.smart_highlights,
-                "dark_export": request.dark_export
-            }
-        )
-        
-        return GenerationResponse(
-            success=True,
-            file_path=result["file_path"],
-            filename=result["filename"],
-            message="Notes generated successfully",
-            metadata={
-                "total_chapters": result["total_chapters"],
-                "total_topics": result["total_topics"],
-                "total_pages": result["total_pages"],
-                "sources_used": result["sources_used"],
-                "generation_time": result["generation_time"]
-            }
-        )
+        if request.stream_pdf:
+            return await stream_build("notes", generate_notes_book, kwargs)
+        # Generate notes/mini-book PDF on the worker pool
+        result = await run_cached("notes", generate_notes_book, kwargs)
+        return notes_response(result)
+    except (PoolSaturatedError, WorkerCrashedError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating notes: {str(e)}")
 
-@app.get("/api/download/{filename}")
-async def download_pdf(filename: str):
-    """Download generated PDF file"""
-    file_path = os.path.join("output", filename)
-    if not os.path.exists(file_path):
+async def gather_builds(builds, parallel):
+    """Await build coroutines together on the worker pool, or one after another"""
+    if parallel:
+        return await asyncio.gather(*builds)
+    return [await build for build in builds]
+
+def bundle_archive(files):
+    """Zip of (filename, path, pdf_bytes) entries; PDFs are already compressed, so they are stored"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for filename, path, pdf_bytes in files:
+            if path is not None:
+                archive.write(path, arcname=filename)
+            else:
+                archive.writestr(filename, pdf_bytes)
+    return buffer.getvalue()
+
+@app.post("/api/generate/bundle")
+async def create_bundle(request: BundleRequest):
+    """
+    Generate the answer key and the notes for a subject together:
+    - Subject data is loaded once
+    - Questions are resolved against the textbook once for both documents
+    - Both PDFs render at the same time on the worker pool (parallel_builds)
+    - archive returns both PDFs in one zip instead of download links
+    - If the topics leave the notes nothing to cover, only the answer key is built
+      and notes_skipped (or the X-Notes-Skipped archive header) says why
+    """
+    start_time = time.time()
+    answer_kwargs, notes_build_kwargs, notes_skipped = await run_in_threadpool(bundle_kwargs, request)
+    try:
+        if request.archive:
+            builds = [render_in_memory("answer-key", generate_answer_key, answer_kwargs)]
+            if notes_build_kwargs is not None:
+                builds.append(render_in_memory("notes", generate_notes_book, notes_build_kwargs))
+            files = await gather_builds(builds, request.parallel_builds)
+            content = bundle_archive(files)
+            archive_name = f"AcadIntel_Bundle_{answer_kwargs['subject_name'].replace(' ', '_')}.zip"
+            headers = {
+                "Content-Length": str(len(content)),
+                "Content-Disposition": f'attachment; filename="{archive_name}"'
+            }
+            if notes_skipped is not None:
+                # Header values must be Latin-1; topic names in the reason may not be
+                headers["X-Notes-Skipped"] = notes_skipped.encode("ascii", "backslashreplace").decode()
+            return Response(content=content, media_type="application/zip", headers=headers)
+
+        builds = [run_cached("answer-key", generate_answer_key, answer_kwargs)]
+        if notes_build_kwargs is not None:
+            builds.append(run_cached("notes", generate_notes_book, notes_build_kwargs))
+        answer_key, *notes = await gather_builds(builds, request.parallel_builds)
+        return {
+            "success": True,
+            "subject_name": answer_kwargs["subject_name"],
+            "answer_key": answer_key_response(answer_key),
+            "notes": notes_response(notes[0]) if notes else None,
+            "notes_skipped": notes_skipped,
+            "generation_time": round(time.time() - start_time, 2)
+        }
+    except (PoolSaturatedError, WorkerCrashedError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating bundle: {str(e)}")
+
+def job_submitted(job):
+    """Response body for a newly submitted job"""
+    return JSONResponse(status_code=202, content={
+        "job_id": job.id,
+        "state": job.state,
+        "status_url": f"/api/jobs/{job.id}",
+        "events_url": f"/api/jobs/{job.id}/events"
+    })
+
+def submit_cached_job(kind, func, kwargs, to_response):
+    """Submit a job, completing it immediately when the PDF is already cached"""
+    key, kwargs, cached = prepare_cached_build(kind, kwargs)
+    if cached is not None:
+        return job_submitted(job_manager.completed(kind, to_response(cached).model_dump()))
+
+    def on_result(result):
+        pdf_cache.put(key, result)
+        return to_response(result).model_dump()
+
+    try:
+        job = job_manager.submit(kind, func, kwargs, on_result, dedupe_key=key)
+    except JobLimitError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return job_submitted(job)
+
+@app.post("/api/jobs/answer-key")
+async def submit_answer_key_job(request: AnswerKeyRequest):
+    """Queue an answer key build and return its job id immediately"""
+    kwargs = await run_in_threadpool(answer_key_kwargs, request)
+    return submit_cached_job("answer-key", generate_answer_key, kwargs, answer_key_response)
+
+@app.post("/api/jobs/notes")
+async def submit_notes_job(request: NotesRequest):
+    """Queue a notes build and return its job id immediately"""
+    kwargs = await run_in_threadpool(notes_kwargs, request)
+    return submit_cached_job("notes", generate_notes_book, kwargs, notes_response)
+
+# Per-kind batch builders: (request model, kwargs builder, generator, response wrapper)
+BATCH_BUILDERS = {
+    "answer-key": (AnswerKeyRequest, answer_key_kwargs, generate_answer_key, answer_key_response),
+    "notes": (NotesRequest, notes_kwargs, generate_notes_book, notes_response)
+}
+# Request fields that are not settings of a batch variant
+BATCH_EXCLUDED_FIELDS = {"subject_id", "subject_name", "stream_pdf"}
+BATCH_VARIANT_FIELDS = {
+    field
+    for model, _, _, _ in BATCH_BUILDERS.values()
+    for field in model.model_fields
+} - BATCH_EXCLUDED_FIELDS
+ARCHIVE_SPOOL_BYTES = 16 * 1024 * 1024
+ARCHIVE_CHUNK_SIZE = 1024 * 1024
+
+def batch_entries(request):
+    """Expand subjects x kinds x variants into entries with canonical subject ids and settings
+
+    Settings are the full, validated request fields of the kind, so a variant that
+    spells out a default is the same entry as one that leaves it out.
+    """
+    for variant in request.variants:
+        unknown = set(variant) - BATCH_VARIANT_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown variant settings: {', '.join(sorted(unknown))}")
+    try:
+        subjects = [subject_registry.resolve(name, name) for name in request.subjects]
+    except UnknownSubjectError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    entries = []
+    for subject in subjects:
+        for kind in request.kinds:
+            if kind not in BATCH_BUILDERS:
+                raise HTTPException(status_code=400, detail=f"Unknown document kind: {kind}")
+            model = BATCH_BUILDERS[kind][0]
+            for variant in request.variants:
+                try:
+                    settings = model(**variant).model_dump(exclude=BATCH_EXCLUDED_FIELDS)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                if "topics" in settings:
+                    settings["topics"] = normalize_topics(settings["topics"])
+                entries.append(BatchEntry(kind, subject.subject_id, settings))
+    return entries
+
+async def build_batch_entry(entry):
+    """GenerationResponse dict for one batch entry, through the PDF cache"""
+    model, kwargs_builder, func, to_response = BATCH_BUILDERS[entry.kind]
+    kwargs = await run_in_threadpool(kwargs_builder, model(subject_id=entry.subject, **entry.settings))
+    result = await run_cached(entry.kind, func, kwargs)
+    return to_response(result).model_dump()
+
+def batch_manifest(job_id, entries, unique, assignment, outcomes, wall_seconds):
+    """Job result of a batch: one manifest row per entry and aggregate throughput"""
+    manifest = []
+    seen = set()
+    for position, entry in enumerate(entries):
+        build = assignment[position]
+        outcome = outcomes[build]
+        row = {
+            "kind": entry.kind,
+            "subject_id": entry.subject,
+            "settings": entry.settings,
+            "status": outcome["status"],
+            "duplicate_of": assignment.index(build) if build in seen else None,
+            "seconds": outcome["seconds"],
+        }
+        seen.add(build)
+        if outcome["status"] == "completed":
+            row["result"] = outcome["result"]
+            row["download_url"] = f"/api/download/{outcome['result']['filename']}"
+        else:
+            row["error"] = outcome["error"]
+        manifest.append(row)
+
+    sizes = []
+    cached = 0
+    for outcome in outcomes:
+        if outcome["status"] == "completed":
+            stored = output_storage.stat(outcome["result"]["filename"])
+            sizes.append(stored.size if stored is not None else 0)
+            cached += outcome["result"]["metadata"].get("cached", False)
+    return {
+        "entries": manifest,
+        "archive_url": f"/api/batches/{job_id}/archive",
+        "throughput": dict(
+            throughput(outcomes, wall_seconds, sizes),
+            entries=len(entries),
+            duplicates=len(entries) - len(unique),
+            cached=cached
+        )
+    }
+
+@app.post("/api/batches")
+async def submit_batch(request: BatchRequest):
+    """
+    Pre-generate documents for many subjects as one job:
+    - Every subject x kind x settings variant is an entry
+    - Identical entries (by subject id or any of its names) build once
+    - At most `concurrency` builds run on the worker pool at a time
+    - The job result is a manifest with download links and aggregate throughput;
+      /api/batches/{job_id}/archive zips every PDF of the batch
+    """
+    entries = batch_entries(request)
+    try:
+        unique, assignment = plan_batch(entries)
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    concurrency = min(request.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+
+    async def runner(job, progress):
+        start_time = time.perf_counter()
+        outcomes = await run_batch(unique, build_batch_entry, concurrency, progress)
+        return batch_manifest(job.id, entries, unique, assignment, outcomes,
+                              time.perf_counter() - start_time)
+
+    try:
+        job = job_manager.start("batch", runner, dedupe_key=f"batch:{batch_key(unique)}")
+    except JobLimitError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return job_submitted(job)
+
+def batch_archive(files):
+    """(spooled zip, size) of (filename, path) pairs; large batches spill to disk"""
+    spool = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_BYTES)
+    write_archive(spool, files)
+    size = spool.tell()
+    spool.seek(0)
+    return spool, size
+
+def iter_spool(spool):
+    with spool:
+        while True:
+            chunk = spool.read(ARCHIVE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+@app.get("/api/batches/{job_id}/archive")
+async def download_batch_archive(job_id: str):
+    """Every PDF of a finished batch in one zip; files swept from storage since are left out"""
+    job = job_manager.get(job_id)
+    if job is None or job.kind != "batch":
+        raise HTTPException(status_code=404, detail="Batch not found")
+    if job.result is None:
+        raise HTTPException(status_code=409, detail=f"Batch is {job.state}")
+
+    files = {}
+    for row in job.result["entries"]:
+        if row["status"] == "completed" and row["duplicate_of"] is None:
+            filename = row["result"]["filename"]
+            path = output_storage.path(filename)
+            if path is not None and os.path.exists(path):
+                files[filename] = path
+    if not files:
+        raise HTTPException(status_code=410, detail="No files of this batch are still stored")
+
+    spool, size = await run_in_threadpool(batch_archive, list(files.items()))
+    return StreamingResponse(
+        iter_spool(spool),
+        media_type="application/zip",
+        headers={
+            "Content-Length": str(size),
+            "Content-Disposition": f'attachment; filename="AcadIntel_Batch_{job_id}.zip"'
+        }
+    )
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Report the state, progress and result of a generation job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Stream job progress as server-sent events until the job finishes"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(
+        job_manager.stream(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@app.api_route("/api/download/{filename}", methods=["GET", "HEAD"])
+async def download_pdf(filename: str, request: Request):
+    """Download generated PDF file
+
+    Supports If-None-Match (304), single byte ranges (206) and If-Range.
+    Content-addressed files are cacheable forever; others must revalidate.
+    """
+    file_path = output_storage.path(filename)
+    if file_path is None:
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(
-        path=file_path,
-        filename=filename,
-        media_type="application/pdf"
+
+    etag = key_etag(filename, stat) or await run_in_threadpool(file_etag, file_path, stat)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if is_immutable(filename) else REVALIDATE_CACHE_CONTROL
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), stat.st_size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers=dict(headers, **{
+                "Content-Range": f"bytes */{stat.st_size}"
+            }))
+
+    if byte_range is None:
+        return FileResponse(
+            path=file_path,
+            filename=filename,
+            media_type="application/pdf",
+            headers=headers,
+            stat_result=stat
+        )
+
+    start, end = byte_range
+    headers.update({
+        "Content-Range": f"bytes {start}-{end}/{stat.st_size}",
+        "Content-Length": str(end - start + 1),
+        "Content-Disposition": f'attachment; filename="{filename}"'
+    })
+    body = iter_file_range(file_path, start, end) if request.method == "GET" else iter(())
+    return StreamingResponse(body, status_code=206, media_type="application/pdf", headers=headers)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def textbook_ingested(summary):
+    """Ingestion job result: the summary, once the textbook is usable as a subject"""
+    register_textbook(subject_registry, summary)
+    return summary
+
+def save_upload(source, directory):
+    """(path, SHA-256) of a spooled upload copied into directory in one pass
+
+    Starlette has already spooled the body to a temp file (which has no name to
+    rename), so this is blocking file I/O for run_in_threadpool.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{uuid.uuid4().hex}.pdf")
+    digest = hashlib.sha256()
+    source.seek(0)
+    with open(path, "wb") as f:
+        for chunk in iter(lambda: source.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            f.write(chunk)
+    return path, digest.hexdigest()
+
+@app.post("/api/textbooks")
+async def upload_textbook(
+    file: UploadFile = File(...),
+    title: str = Form(...),
+    author: str = Form(""),
+    isbn: str = Form(""),
+    edition: str = Form("")
+):
+    """Ingest a textbook PDF as a background job
+
+    The upload is hashed and copied to disk off the event loop; a PDF that was
+    already ingested completes immediately with its stored summary.
+    """
+    pdf_path, content_hash = await run_in_threadpool(
+        save_upload, file.file, os.path.join(TEXTBOOK_DIR, "uploads")
+    )
+    textbook_id = textbook_id_for(title, content_hash)
+    summary = load_summary(textbook_id)
+    if summary is not None:
+        os.remove(pdf_path)
+        return job_submitted(job_manager.completed("textbook", summary))
+    running = job_manager.active_job(("textbook", textbook_id))
+    if running is not None:
+        os.remove(pdf_path)
+        return job_submitted(running)
+
+    kwargs = {
+        "pdf_path": pdf_path,
+        "textbook_id": textbook_id,
+        "title": title,
+        "author": author,
+        "isbn": isbn,
+        "edition": edition,
+        "remove_source": True
+    }
+    try:
+        job = job_manager.submit("textbook", ingest_textbook, kwargs, textbook_ingested,
+                                 dedupe_key=("textbook", textbook_id))
+    except JobLimitError as e:
+        os.remove(pdf_path)
+        raise HTTPException(status_code=503, detail=str(e))
+    return job_submitted(job)
+
+@app.get("/api/textbooks")
+async def get_textbooks():
+    """List ingested textbooks"""
+    return {"textbooks": list_textbooks()}
+
+@app.get("/api/textbooks/{textbook_id}")
+async def get_textbook(textbook_id: str):
+    """Get the chapters and sections of an ingested textbook"""
+    textbook = load_textbook(textbook_id)
+    if textbook is None:
+        raise HTTPException(status_code=404, detail="Textbook not found")
+    return textbook
+
+@app.post("/api/question-banks/{subject}")
+async def upload_question_bank(subject: str, request: Request, format: Optional[str] = None):
+    """Add past-paper questions to a subject from a JSONL or CSV upload
+
+    The multipart body is parsed as it arrives and the file part is piped to a
+    threadpool thread that validates and adds one record at a time, so nothing
+    is spooled. format may be a query parameter or a form field sent before
+    the file; otherwise it comes from the file name.
+    """
+    loaded = await run_in_threadpool(load_subject, subject, subject)
+    try:
+        parser = MultipartStream(multipart_boundary(request.headers.get("content-type")))
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    pipe = BodyPipe(asyncio.get_running_loop())
+    fields = {}
+    ingest = None
+    piping = False  # inside the file part being ingested
+    try:
+        async for chunk in request.stream():
+            if ingest is not None and ingest.done():
+                break  # the reader stopped early (e.g. rejected the file); its error is raised below
+            for event in parser.feed(chunk):
+                if event[0] == "field":
+                    fields[event[1]] = event[2]
+                elif event[0] == "file" and event[1] == "file" and ingest is None:
+                    fmt = bank_format(event[2], format or fields.get("format"))
+                    ingest = asyncio.ensure_future(
+                        run_in_threadpool(ingest_question_bank, loaded.bank, io.BufferedReader(pipe), fmt)
+                    )
+                    piping = True
+                elif event[0] == "data" and piping:
+                    await pipe.put(event[1], ingest)
+                elif event[0] == "end" and piping:
+                    await pipe.finish(ingest)
+                    piping = False
+        if ingest is None:
+            raise HTTPException(status_code=400, detail="Upload needs a file part named 'file'")
+        result = await ingest
+    except (UploadError, QuestionBankError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        # A body cut off mid-file still ends the reader; the records it already took are kept
+        if ingest is not None:
+            await pipe.finish(ingest)
+    subject_registry.resized(loaded.subject.subject_id)
+    return result
+
+@app.get("/api/question-banks/{subject}")
+async def get_question_bank(subject: str):
+    """Report a subject's question count, near-duplicate clusters and flag totals"""
+    loaded = await run_in_threadpool(load_subject, subject, subject)
+    return loaded.bank.stats()
+
+@app.get("/api/search")
+async def search(subject: str, q: str, limit: int = DEFAULT_LIMIT):
+    """Search a subject's textbook; returns ranked sections with snippets and citations
+
+    Wrap words in double quotes to require them as a phrase.
+    """
+    loaded = await run_in_threadpool(load_subject, subject, subject)
+    start_time = time.perf_counter()
+    try:
+        found = search_textbook(loaded.textbook, q, limit)
+    except SearchQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return dict(
+        found,
+        subject_id=loaded.subject.subject_id,
+        query=q,
+        search_time_ms=round((time.perf_counter() - start_time) * 1000, 2)
     )
 
 @app.get("/api/demo/textbook")
@@ -4,145 +4,127 @@ Generates comprehensive answer keys with source references
 """
 
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table
 from datetime import datetime
-import os
 import time
 
+from services.highlighter import highlight_terms
+from services.pdf_fragments import fragment_cache
+from services.pdf_styles import get_theme
+from services.question_clusters import with_computed_frequencies
+from services.question_flags import classify_questions, BUCKET_FREQUENT
+from services.resolution_cache import resolution_cache
+from services.storage import output_storage
+from services.textbook_index import get_textbook_index
+
+# Bump whenever the rendered output changes so cached PDFs are rebuilt
+GENERATOR_VERSION = "1.6"
+
 def identify_repeated_questions(questions):
     """Identify repeated or similar questions based on frequency"""
-    repeated = []
-    for q in questions:
-        if q.get('frequency', 0) >= 3:  # Appeared 3+ times
-            repeated.append(q['id'])
-    return repeated
+    flags = classify_questions(questions)
+    return [q['id'] for position, q in enumerate(questions) if flags.is_repeated(position)]
 
 def identify_high_weightage(questions):
     """Identify high-weightage questions"""
-    high_weightage = []
-    for q in questions:
-        if q.get('weightage', 0) >= 10:
-            high_weightage.append(q['id'])
-    return high_weightage
+    flags = classify_questions(questions)
+    return [q['id'] for position, q in enumerate(questions) if flags.is_high_weightage(position)]
+
+def find_answer_in_textbook(question, textbook, ranking=None):
+    """Find answer from textbook content
 
-def find_answer_in_textbook(question, textbook):
-    """Find answer from textbook content"""
+    ranking is this question's entry from TextbookIndex.rank(); pass it when
+    resolving a whole question list so all questions are scored in one batch.
+    """
     question_topics = set(topic.lower() for topic in question.get('topics', []))
+    index = get_textbook_index(textbook)
+    if ranking is None:
+        ranking = resolution_cache.rank(textbook, [question])[0]
     
-    for chapter in textbook.get('chapters', []):
-        for section in chapter.get('sections', []):
-            section_title_lower = section['title'].lower()
-            
-            # Check if question topics match section
-            if any(topic in section_title_lower for topic in question_topics):
-                return {
-                    'found': True,
-                    'answer': section['content'],
-                    'source': {
-                        'book': textbook['title'],
-                        'author': textbook['author'],
-                        'chapter': chapter['number'],
-                        'section': section['title'],
-                        'page': section.get('page', 'N/A')
-                    },
-                    'key_terms': section.get('key_terms', [])
-                }
+    # Best-scoring section across titles, key terms and content
+    match = index.best_section(ranking)
+    if match is not None:
+        chapter, section, score = match
+        return {
+            'found': True,
+            'answer': section['content'],
+            'score': score,
+            'source': {
+                'book': textbook['title'],
+                'author': textbook['author'],
+                'chapter': chapter['number'],
+                'section': section['title'],
+                'page': section.get('page', 'N/A')
+            },
+            'key_terms': section.get('key_terms', []),
+            'matches': [
+                {'section': index.sections[position][1]['title'], 'score': hit_score}
+                for hit_score, position in ranking
+            ]
+        }
     
     # If not found, provide external resource links
     return {
         'found': False,
         'answer': None,
+        'score': ranking[0][0] if ranking else 0.0,
         'external_resources': [
             f"https://scholar.google.com/scholar?q={'+'.join(question['text'].split()[:5])}",
             f"https://www.khanacademy.org/search?q={'+'.join(question_topics)}"
         ]
     }
 
-def generate_answer_key(subject_name, questions, textbook, settings):
-    """Generate comprehensive answer key PDF"""
-    start_time = time.time()
-    
-    # Create output directory
-    os.makedirs("output", exist_ok=True)
+def _footer_page(theme):
+    """Closing "End of Answer Key" page, shared across builds on the same day"""
+    generated = datetime.now().strftime('%B %d, %Y')
     
-    # Generate filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"AcadIntel_AnswerKey_{subject_name.replace(' ', '_')}_{timestamp}.pdf"
-    filepath = os.path.join("output", filename)
-    
-    # Identify special questions
-    repeated = identify_repeated_questions(questions)
-    high_weightage = identify_high_weightage(questions)
-    
-    # Create PDF
-    doc = SimpleDocTemplate(filepath, pagesize=A4,
-                           rightMargin=0.75*inch, leftMargin=0.75*inch,
-                           topMargin=0.75*inch, bottomMargin=0.75*inch)
-    
-    # Styles
-    styles = getSampleStyleSheet()
+    def build():
+        footer_text = f"Generated by AcadIntel AI - Source-Verified Answers - {generated}"
+        return [
+            Spacer(1, 0.5*inch),
+            Paragraph("End of Answer Key", theme.answer_key['subtitle']),
+            Paragraph(footer_text, theme.answer_key['source'])
+        ]
     
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#195de6'),
-        spaceAfter=12,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
+    return fragment_cache.get("answer_key_footer", (generated, theme.dark), build)
+
+def generate_answer_key(subject_name, questions, textbook, settings, progress_callback=None,
+                        filename=None, in_memory=False, rankings=None):
+    """Generate comprehensive answer key PDF
+
+    filename overrides the default timestamped output name.
+    rankings are precomputed resolution_cache.rank() entries for questions; without
+    them this process's resolution cache is consulted.
+    in_memory renders into a buffer instead of output storage: the result then carries
+    the document as `pdf_bytes` and `file_path` is None.
+    progress_callback, if given, is called as progress_callback(done, total, message)
+    after each question and before the final layout pass.
+    """
+    start_time = time.time()
     
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Normal'],
-        fontSize=12,
-        textColor=colors.grey,
-        spaceAfter=20,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Oblique'
-    )
+    # Generate filename
+    if filename is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"AcadIntel_AnswerKey_{subject_name.replace(' ', '_')}_{timestamp}.pdf"
     
-    question_style = ParagraphStyle(
-        'Question',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#111318'),
-        spaceAfter=8,
-        spaceBefore=12,
-        fontName='Helvetica-Bold'
-    )
+    # Raise hand-entered frequencies to near-duplicate cluster sizes
+    questions = with_computed_frequencies(questions)
     
-    answer_style = ParagraphStyle(
-        'Answer',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=colors.black,
-        spaceAfter=10,
-        alignment=TA_JUSTIFY,
-        leading=14
-    )
+    # Classify every question once; badges and statistics read these flags
+    flags = classify_questions(questions)
     
-    source_style = ParagraphStyle(
-        'Source',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#636f88'),
-        spaceAfter=8,
-        fontName='Helvetica-Oblique'
-    )
+    # Rank textbook sections for every question in one batch (memoized across requests)
+    if rankings is None:
+        rankings = resolution_cache.rank(textbook, questions)
     
-    badge_style = ParagraphStyle(
-        'Badge',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.white,
-        spaceAfter=4
-    )
+    # Styles (shared per-process registry, light or dark)
+    theme = get_theme(settings.get('dark_export', False))
+    title_style = theme.answer_key['title']
+    subtitle_style = theme.answer_key['subtitle']
+    question_style = theme.answer_key['question']
+    answer_style = theme.answer_key['answer']
+    source_style = theme.answer_key['source']
     
     # Build document content
     content = []
@@ -156,22 +138,13 @@ def generate_answer_key(subject_name, questions, textbook, settings):
     # Statistics table
     stats_data = [
         ['Total Questions', str(len(questions))],
-        ['Repeated Questions', str(len(repeated))],
-        ['High Weightage (>=10 marks)', str(len(high_weightage))],
+        ['Repeated Questions', str(flags.repeated)],
+        ['High Weightage (>=10 marks)', str(flags.high_weightage)],
         ['Source Book', textbook['title']]
     ]
     
     stats_table = Table(stats_data, colWidths=[2.5*inch, 3*inch])
-    stats_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f0f2f4')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('PADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-    ]))
+    stats_table.setStyle(theme.tables['stats'])
     
     content.append(stats_table)
     content.append(Spacer(1, 0.4*inch))
@@ -179,20 +152,27 @@ def generate_answer_key(subject_name, questions, textbook, settings):
     
     # Process each question
     sources_used = set()
+    retrieval_scores = []
+    dedupe = settings.get('dedupe_answers', False)
+    answered_sections = {}  # (chapter, section title) -> question number with the full answer
+    full_answers = 0
+    cross_references = 0
     
     for idx, question in enumerate(questions, 1):
         # Question number and badges
         badges = []
-        if question['id'] in repeated:
+        if flags.is_repeated(idx - 1):
             badges.append("[REPEATED]")
-        if question['id'] in high_weightage:
+        if flags.is_high_weightage(idx - 1):
             badges.append("[HIGH WEIGHTAGE]")
-        if question.get('frequency', 0) >= 4:
+        if flags.bucket(idx - 1) == BUCKET_FREQUENT:
             badges.append(f"[Asked {question['frequency']} times]")
         
         question_header = f"Q{idx}. {question['text']}"
+        if dedupe:
+            question_header = f"<a name='answer_q{idx}'/>{question_header}"
         if badges:
-            question_header += f" <font color='#195de6'>{' | '.join(badges)}</font>"
+            question_header += f" <font color='{theme.palette['primary']}'>{' | '.join(badges)}</font>"
         
         content.append(Paragraph(question_header, question_style))
         
@@ -202,19 +182,30 @@ def generate_answer_key(subject_name, questions, textbook, settings):
         content.append(Spacer(1, 0.1*inch))
         
         # Find answer
-        result = find_answer_in_textbook(question, textbook)
+        result = find_answer_in_textbook(question, textbook, rankings[idx - 1])
+        retrieval_scores.append(f"{question['id']}={result['score']}")
+        
+        section_key = (result['source']['chapter'], result['source']['section']) if result['found'] else None
+        first_answer = answered_sections.get(section_key) if dedupe and section_key else None
         
-        if result['found']:
+        if first_answer is not None:
+            # Same section as an earlier question: link back instead of repeating it
+            cross_references += 1
+            content.append(Paragraph(
+                f"<b>Answer:</b> See <a href='#answer_q{first_answer}' color='{theme.palette['primary']}'>"
+                f"answer to Q{first_answer}</a> ({result['source']['section']}).",
+                answer_style
+            ))
+        elif result['found']:
+            if section_key:
+                answered_sections[section_key] = idx
+            
             # Answer from textbook
             answer_text = result['answer']
             
             # Highlight key terms if enabled
             if settings.get('smart_highlights', True) and result.get('key_terms'):
-                for term in result['key_terms']:
-                    answer_text = answer_text.replace(
-                        term,
-                        f"<b>{term}</b>"
-                    )
+                answer_text = highlight_terms(answer_text, result['key_terms'], "<b>", "</b>")
             
             content.append(Paragraph(f"<b>Answer:</b>", answer_style))
             content.append(Paragraph(answer_text.replace('\n', '<br/>'), answer_style))
@@ -238,28 +229,45 @@ def generate_answer_key(subject_name, questions, textbook, settings):
         
         content.append(Spacer(1, 0.2*inch))
         
-        # Page break after every 2 questions for readability
-        if idx % 2 == 0 and idx < len(questions):
-            content.append(PageBreak())
+        # Page break after every 2 full answers for readability (cross-references are compact)
+        if first_answer is None:
+            full_answers += 1
+            if full_answers % 2 == 0 and idx < len(questions):
+                content.append(PageBreak())
+        
+        if progress_callback:
+            progress_callback(idx, len(questions), f"Processed question {idx} of {len(questions)}")
     
     # Footer
     content.append(PageBreak())
-    content.append(Spacer(1, 0.5*inch))
-    content.append(Paragraph("End of Answer Key", subtitle_style))
-    footer_text = f"Generated by AcadIntel AI - Source-Verified Answers - {datetime.now().strftime('%B %d, %Y at %I:%M %p')}"
-    content.append(Paragraph(footer_text, source_style))
+    content.extend(_footer_page(theme))
     
-    # Build PDF
-    doc.build(content)
+    # Build PDF (written to a temp file and renamed into place when complete)
+    if progress_callback:
+        progress_callback(len(questions), len(questions), "Rendering PDF")
+    with output_storage.writer(filename, in_memory) as target:
+        doc = SimpleDocTemplate(target, pagesize=A4,
+                               rightMargin=0.75*inch, leftMargin=0.75*inch,
+                               topMargin=0.75*inch, bottomMargin=0.75*inch,
+                               title=f"{subject_name} Answer Key",
+                               subject="Retrieval: BM25 over section titles, key terms and content")
+        # Record the chosen retrieval score per question in the PDF metadata
+        doc.keywords = retrieval_scores
+        doc.build(content, onFirstPage=theme.draw_page, onLaterPages=theme.draw_page)
     
     generation_time = round(time.time() - start_time, 2)
     
-    return {
-        "file_path": filepath,
+    result = {
+        "file_path": None if in_memory else output_storage.path(filename),
         "filename": filename,
         "total_questions": len(questions),
-        "repeated_questions": len(repeated),
-        "high_weightage": len(high_weightage),
+        "repeated_questions": flags.repeated,
+        "high_weightage": flags.high_weightage,
+        "frequency_buckets": flags.counts()["frequency_buckets"],
+        "deduplicated_answers": cross_references,
         "sources_used": list(sources_used),
         "generation_time": generation_time
     }
+    if in_memory:
+        result["pdf_bytes"] = target.getvalue()
+    return result
@@ -0,0 +1,118 @@
+"""
+Batch Generation
+Expands subject x document x settings batches, deduplicates them and runs the builds
+with a per-batch concurrency limit
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import zipfile
+from collections import namedtuple
+
+from services.worker_pool import generation_pool, PoolSaturatedError
+
+# Batch configuration (override through environment variables)
+MAX_BATCH_ENTRIES = int(os.getenv("ACADINTEL_MAX_BATCH_ENTRIES", "500"))
+BATCH_CONCURRENCY = int(os.getenv("ACADINTEL_BATCH_CONCURRENCY", str(generation_pool.max_workers)))
+SATURATED_RETRY_SECONDS = 0.5  # wait before retrying a build the pool had no room for
+
+KINDS = ("answer-key", "notes")
+
+# subject is the registered subject id; settings the request fields that shape the PDF
+BatchEntry = namedtuple("BatchEntry", ["kind", "subject", "settings"])
+
+
+class BatchError(ValueError):
+    """Raised for a batch that cannot be scheduled (unknown kind, too many entries)"""
+
+
+def entry_key(entry):
+    return (entry.kind, entry.subject, json.dumps(entry.settings, sort_keys=True))
+
+
+def batch_key(entries):
+    """Identity of a whole batch, so resubmitting it returns the running job"""
+    encoded = json.dumps(sorted(entry_key(entry) for entry in entries))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def plan_batch(entries):
+    """(unique entries, for each entry the position of its unique build)
+
+    Entries that name the same subject (by id or by any of its names) with the
+    same effective settings are built once.
+    """
+    if len(entries) > MAX_BATCH_ENTRIES:
+        raise BatchError(f"Batch has {len(entries)} entries ({MAX_BATCH_ENTRIES} max)")
+    unique, positions, assignment = [], {}, []
+    for entry in entries:
+        if entry.kind not in KINDS:
+            raise BatchError(f"Unknown document kind {entry.kind!r}; use one of {', '.join(KINDS)}")
+        key = entry_key(entry)
+        if key not in positions:
+            positions[key] = len(unique)
+            unique.append(entry)
+        assignment.append(positions[key])
+    return unique, assignment
+
+
+async def run_batch(entries, build, concurrency=BATCH_CONCURRENCY, progress=None):
+    """Run `await build(entry)` for every unique entry, at most `concurrency` at a time
+
+    Returns one outcome dict per entry: status, the build's result or error, and
+    its duration. A build turned away by a full pool waits and retries instead
+    of failing, so a batch never starves interactive requests of queue slots.
+    """
+    limit = asyncio.Semaphore(max(1, min(concurrency, generation_pool.capacity)))
+    outcomes = [None] * len(entries)
+    finished = 0
+
+    async def run_one(position, entry):
+        nonlocal finished
+        async with limit:
+            start = time.perf_counter()
+            while True:
+                try:
+                    outcome = {"status": "completed", "result": await build(entry)}
+                    break
+                except PoolSaturatedError:
+                    await asyncio.sleep(SATURATED_RETRY_SECONDS)
+                except Exception as e:
+                    outcome = {"status": "failed", "error": str(e)}
+                    break
+            outcome["seconds"] = round(time.perf_counter() - start, 3)
+        outcomes[position] = outcome
+        finished += 1
+        if progress:
+            progress(finished, len(entries), f"Built {entry.kind} for {entry.subject}")
+
+    await asyncio.gather(*(run_one(position, entry) for position, entry in enumerate(entries)))
+    return outcomes
+
+
+def throughput(outcomes, wall_seconds, sizes):
+    """Aggregate batch statistics; sizes are the byte sizes of the completed PDFs"""
+    completed = [outcome for outcome in outcomes if outcome["status"] == "completed"]
+    build_seconds = sum(outcome["seconds"] for outcome in outcomes)
+    total_bytes = sum(sizes)
+    return {
+        "builds": len(outcomes),
+        "completed": len(completed),
+        "failed": len(outcomes) - len(completed),
+        "wall_seconds": round(wall_seconds, 3),
+        "build_seconds": round(build_seconds, 3),
+        "builds_per_second": round(len(completed) / wall_seconds, 3) if wall_seconds else 0.0,
+        "bytes": total_bytes,
+        "bytes_per_second": round(total_bytes / wall_seconds) if wall_seconds else 0,
+        "concurrency_gain": round(build_seconds / wall_seconds, 2) if wall_seconds else 0.0,
+    }
+
+
+def write_archive(target, files):
+    """Zip (filename, path) pairs into target; PDFs are already compressed, so they are stored"""
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_STORED) as archive:
+        for filename, path in files:
+            archive.write(path, arcname=filename)
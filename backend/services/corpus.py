@@ -0,0 +1,377 @@
+"""
+Compiled Textbook Corpus
+Binary textbook format (string table, chapter/section arrays, BM25 and positional postings) opened with mmap
+"""
+
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from collections.abc import Mapping
+
+from services.pdf_cache import textbook_fingerprint
+from services.storage import atomic_write
+from services.textbook_index import TextbookIndex, section_term_positions
+
+# Corpus configuration (override through environment variables)
+CORPUS_DIR = os.getenv("ACADINTEL_CORPUS_DIR", "corpus")
+CORPUS_SUFFIX = ".acorpus"
+
+MAGIC = b"ACORPUS\x00"
+FORMAT_VERSION = 2
+NO_PAGE = 0xFFFFFFFF
+_ALIGN = 8
+
+# magic, version, byte order, string/chapter/section/key term/term/posting/position counts,
+# title/author/isbn/edition/fingerprint string ids, then eleven table offsets
+_HEADER = struct.Struct("=8sII7I5I11Q")
+_CHAPTER_FIELDS = 4  # number, title id, first section, section count
+_SECTION_FIELDS = 5  # title id, content id, page, first key term, key term count
+_BYTE_ORDER = 1 if sys.byteorder == "little" else 2
+
+# Open corpora keyed by path; entries are replaced when the file changes
+_open = OrderedDict()
+_open_lock = threading.Lock()
+_OPEN_SLOTS = 256
+
+# One lock per corpus path, so concurrent cold loads of a textbook compile it once
+_compile_locks = defaultdict(threading.Lock)
+
+
+class CorpusFormatError(Exception):
+    """Raised when a file is not a compiled corpus this version can read"""
+
+
+def _u32(values):
+    return array("I", values)
+
+
+def compile_corpus(textbook, path):
+    """Write textbook (a dict in the demo_textbook layout) as a compiled corpus
+
+    The BM25 postings come from TextbookIndex, so a mapped textbook ranks
+    questions exactly like the dict it was compiled from. Each posting also
+    points at the term's word positions in that section, for phrase search
+    and snippets.
+    """
+    strings = {}
+
+    def sid(value):
+        value = "" if value is None else str(value)
+        if value not in strings:
+            strings[value] = len(strings)
+        return strings[value]
+
+    meta = [sid(textbook.get(field, "")) for field in ("title", "author", "isbn", "edition")]
+    meta.append(sid(textbook_fingerprint(textbook)))
+
+    chapters, sections, key_terms = _u32([]), _u32([]), _u32([])
+    for chapter in textbook.get("chapters", []):
+        chapter_sections = chapter.get("sections", [])
+        chapters.extend([chapter["number"], sid(chapter["title"]),
+                         len(sections) // _SECTION_FIELDS, len(chapter_sections)])
+        for section in chapter_sections:
+            terms = section.get("key_terms", [])
+            page = section.get("page")
+            sections.extend([sid(section["title"]), sid(section.get("content", "")),
+                             page if isinstance(page, int) and page >= 0 else NO_PAGE,
+                             len(key_terms), len(terms)])
+            key_terms.extend(sid(term) for term in terms)
+
+    # Postings sorted by the UTF-8 bytes of their term, for binary search without decoding
+    impacts = TextbookIndex(textbook)._impacts
+    section_positions = [section_term_positions(section)
+                         for chapter in textbook.get("chapters", [])
+                         for section in chapter.get("sections", [])]
+    terms = sorted(impacts, key=lambda term: term.encode("utf-8"))
+    term_ids, term_offsets = _u32([]), _u32([0])
+    positions, scores = _u32([]), array("d")
+    word_offsets, word_positions = _u32([0]), _u32([])
+    for term in terms:
+        term_ids.append(sid(term))
+        for position, impact in impacts[term]:
+            positions.append(position)
+            scores.append(impact)
+            word_positions.extend(section_positions[position].get(term, ()))
+            word_offsets.append(len(word_positions))
+        term_offsets.append(len(positions))
+
+    blob = bytearray()
+    string_offsets = _u32([0])
+    for value in strings:  # dicts keep insertion order, which is id order
+        blob += value.encode("utf-8")
+        string_offsets.append(len(blob))
+
+    tables = [string_offsets.tobytes(), bytes(blob), chapters.tobytes(), sections.tobytes(),
+              key_terms.tobytes(), term_ids.tobytes(), term_offsets.tobytes(),
+              positions.tobytes(), scores.tobytes(), word_offsets.tobytes(), word_positions.tobytes()]
+    offsets = []
+    body = bytearray()
+    position = _HEADER.size
+    for table in tables:
+        padding = -position % _ALIGN
+        body += b"\0" * padding
+        position += padding
+        offsets.append(position)
+        body += table
+        position += len(table)
+
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, _BYTE_ORDER,
+        len(strings), len(chapters) // _CHAPTER_FIELDS, len(sections) // _SECTION_FIELDS,
+        len(key_terms), len(terms), len(positions), len(word_positions),
+        *meta, *offsets
+    )
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Unique temp file per writer: another process may be compiling the same textbook
+    with atomic_write(path) as f:
+        f.write(header)
+        f.write(body)
+    return path
+
+
+class _TermPostings:
+    """Read-only term -> [(section position, impact)] view over the mapped postings"""
+
+    def __init__(self, corpus):
+        self._corpus = corpus
+
+    def get(self, term, default=None):
+        span = self._corpus.posting_span(term)
+        if span is None:
+            return default
+        start, stop = span
+        return list(zip(self._corpus.positions[start:stop], self._corpus.scores[start:stop]))
+
+
+class MappedSection(Mapping):
+    """A section read from the corpus on access (same keys as the dict layout)"""
+
+    def __init__(self, corpus, position):
+        self._corpus = corpus
+        self.position = position
+
+    def _field(self, index):
+        return self._corpus.sections[self.position * _SECTION_FIELDS + index]
+
+    def __getitem__(self, key):
+        corpus = self._corpus
+        if key == "title":
+            return corpus.string(self._field(0))
+        if key == "content":
+            return corpus.string(self._field(1))
+        if key == "page" and self._field(2) != NO_PAGE:
+            return self._field(2)
+        if key == "key_terms":
+            start = self._field(3)
+            return [corpus.string(term) for term in corpus.key_terms[start:start + self._field(4)]]
+        raise KeyError(key)
+
+    def __iter__(self):
+        keys = ("title", "content", "key_terms", "page")
+        return iter(keys if self._field(2) != NO_PAGE else keys[:3])
+
+    def __len__(self):
+        return 4 if self._field(2) != NO_PAGE else 3
+
+    def __reduce__(self):
+        return _open_section, (self._corpus.path, self.position)
+
+
+class MappedChapter(Mapping):
+    """A chapter read from the corpus on access"""
+
+    def __init__(self, corpus, position):
+        self._corpus = corpus
+        self.position = position
+        base = position * _CHAPTER_FIELDS
+        self._number, self._title, self._first, self._count = corpus.chapters[base:base + _CHAPTER_FIELDS]
+
+    def __getitem__(self, key):
+        if key == "number":
+            return self._number
+        if key == "title":
+            return self._corpus.string(self._title)
+        if key == "sections":
+            return self._corpus.section_list[self._first:self._first + self._count]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(("number", "title", "sections"))
+
+    def __len__(self):
+        return 3
+
+    def __reduce__(self):
+        return _open_chapter, (self._corpus.path, self.position)
+
+
+class MappedTextbook(Mapping):
+    """A compiled corpus file, usable wherever a textbook dict is expected
+
+    Strings are decoded from the shared mapping when accessed, so every process
+    that opens the same file shares its pages through the OS page cache. Pickling
+    sends only the path; the receiving process opens (or reuses) its own mapping.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < _HEADER.size:
+            raise CorpusFormatError(f"{path} is too short to be a corpus")
+        header = _HEADER.unpack_from(self._mm, 0)
+        magic, version, byte_order = header[:3]
+        if magic != MAGIC or version != FORMAT_VERSION or byte_order != _BYTE_ORDER:
+            raise CorpusFormatError(f"{path} is not a version {FORMAT_VERSION} corpus for this platform")
+
+        (string_count, chapter_count, section_count, key_term_count,
+         self.term_count, posting_count, word_position_count) = header[3:10]
+        meta = header[10:15]
+        offsets = header[15:]
+        view = memoryview(self._mm)
+
+        def table(index, fmt, count):
+            itemsize = struct.calcsize(fmt)
+            return view[offsets[index]:offsets[index] + count * itemsize].cast(fmt)
+
+        self._string_offsets = table(0, "I", string_count + 1)
+        self._blob = offsets[1]
+        self.chapters = table(2, "I", chapter_count * _CHAPTER_FIELDS)
+        self.sections = table(3, "I", section_count * _SECTION_FIELDS)
+        self.key_terms = table(4, "I", key_term_count)
+        self.term_ids = table(5, "I", self.term_count)
+        self.term_offsets = table(6, "I", self.term_count + 1)
+        self.positions = table(7, "I", posting_count)
+        self.scores = table(8, "d", posting_count)
+        self.word_offsets = table(9, "I", posting_count + 1)
+        self.word_positions = table(10, "I", word_position_count)
+
+        self._meta = {field: self.string(string_id)
+                      for field, string_id in zip(("title", "author", "isbn", "edition"), meta)}
+        self.fingerprint = self.string(meta[4])
+        self.section_list = [MappedSection(self, position) for position in range(section_count)]
+        self.chapter_list = [MappedChapter(self, position) for position in range(chapter_count)]
+        self._chapter_starts = [chapter._first for chapter in self.chapter_list]
+        self.bm25_impacts = _TermPostings(self)
+
+    def string_bytes(self, string_id):
+        start = self._blob + self._string_offsets[string_id]
+        return self._mm[start:self._blob + self._string_offsets[string_id + 1]]
+
+    def string(self, string_id):
+        return self.string_bytes(string_id).decode("utf-8")
+
+    def posting_span(self, term):
+        """(start, stop) of term's postings, found by binary search on its UTF-8 bytes, or None"""
+        key = term.encode("utf-8")
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            probe = self.string_bytes(self.term_ids[middle])
+            if probe < key:
+                low = middle + 1
+            elif probe > key:
+                high = middle
+            else:
+                return self.term_offsets[middle], self.term_offsets[middle + 1]
+        return None
+
+    def term_positions(self, term, section_position):
+        """Encoded word positions of term in a section (see section_term_positions), or []"""
+        span = self.posting_span(term)
+        if span is None:
+            return []
+        start, stop = span
+        # A term's postings are in section order
+        index = bisect_left(self.positions, section_position, start, stop)
+        if index == stop or self.positions[index] != section_position:
+            return []
+        return self.word_positions[self.word_offsets[index]:self.word_offsets[index + 1]].tolist()
+
+    def chapter_of(self, section_position):
+        """Chapter holding the section at section_position"""
+        return self.chapter_list[bisect_right(self._chapter_starts, section_position) - 1]
+
+    def __getitem__(self, key):
+        if key == "chapters":
+            return self.chapter_list
+        return self._meta[key]
+
+    def __iter__(self):
+        return iter(("title", "author", "isbn", "edition", "chapters"))
+
+    def __len__(self):
+        return 5
+
+    def __reduce__(self):
+        return open_corpus, (self.path,)
+
+    def to_dict(self):
+        """Plain dict copy, e.g. for JSON responses"""
+        textbook = dict(self._meta)
+        textbook["chapters"] = [
+            {"number": chapter["number"], "title": chapter["title"],
+             "sections": [dict(section) for section in chapter["sections"]]}
+            for chapter in self.chapter_list
+        ]
+        return textbook
+
+
+def open_corpus(path):
+    """Mapped textbook for path, opened once per process and file version"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    version = (stat.st_size, stat.st_mtime_ns)
+    with _open_lock:
+        entry = _open.get(path)
+        if entry is not None and entry[0] == version:
+            _open.move_to_end(path)
+            return entry[1]
+
+    corpus = MappedTextbook(path)
+    with _open_lock:
+        _open[path] = (version, corpus)
+        if len(_open) > _OPEN_SLOTS:
+            _open.popitem(last=False)
+    return corpus
+
+
+def open_or_compile(path, load_textbook):
+    """Corpus at path, compiling load_textbook() there first if it is missing or outdated
+
+    Compiles of one path are serialized: a second caller waits and opens the
+    first one's file instead of compiling it again.
+    """
+    with _compile_locks[os.path.abspath(path)]:
+        if os.path.exists(path):
+            try:
+                return open_corpus(path)
+            except CorpusFormatError:
+                pass  # compiled by an older version; rebuild it
+        compile_corpus(load_textbook(), path)
+        return open_corpus(path)
+
+
+def _open_section(path, position):
+    return open_corpus(path).section_list[position]
+
+
+def _open_chapter(path, position):
+    return open_corpus(path).chapter_list[position]
+
+
+def corpus_path_for(textbook):
+    """Content-addressed corpus location for a textbook dict"""
+    return os.path.join(CORPUS_DIR, f"{textbook_fingerprint(textbook)[:16]}{CORPUS_SUFFIX}")
+
+
+def compiled_textbook(textbook):
+    """Mapped version of a textbook dict, compiling it on first use"""
+    if isinstance(textbook, MappedTextbook):
+        return textbook
+    return open_or_compile(corpus_path_for(textbook), lambda: textbook)
@@ -0,0 +1,137 @@
+"""
+PDF Downloads
+Path sanitization, strong ETags, conditional requests and byte ranges for generated PDFs
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_SAFE_FILENAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*\.pdf$")
+# AcadIntel_{prefix}_{subject}_{key[:16]}.pdf names never change content (see PdfCache.filename_for)
+_CONTENT_ADDRESSED_RE = re.compile(r"_([0-9a-f]{16})\.pdf$")
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# ETags keyed by (path, size, mtime) so a rewritten file gets a fresh hash
+_etags = OrderedDict()
+_etags_lock = threading.Lock()
+_ETAG_SLOTS = 1024
+
+
+class RangeNotSatisfiable(Exception):
+    """Raised when a Range header lies entirely outside the file"""
+
+
+def safe_output_path(directory, filename):
+    """Path of filename inside directory, or None if the name could escape it"""
+    if not _SAFE_FILENAME_RE.match(filename) or ".." in filename:
+        return None
+    root = os.path.realpath(directory)
+    path = os.path.realpath(os.path.join(root, filename))
+    if os.path.dirname(path) != root:
+        return None
+    return path
+
+
+def is_immutable(filename):
+    return bool(_CONTENT_ADDRESSED_RE.search(filename))
+
+
+def key_etag(filename, stat):
+    """Strong ETag of a content-addressed file from the cache key in its name, or None
+
+    Size and mtime tell a rebuild of the same key apart, so nothing is hashed.
+    """
+    match = _CONTENT_ADDRESSED_RE.search(filename)
+    if match is None:
+        return None
+    return f'"{match.group(1)}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def file_etag(path, stat):
+    """Strong ETag: SHA-256 of the file content, hashed once per file version
+
+    Reads the whole file on a miss, so async callers run it in a thread.
+    """
+    version = (path, stat.st_size, stat.st_mtime_ns)
+    with _etags_lock:
+        etag = _etags.get(version)
+        if etag is not None:
+            _etags.move_to_end(version)
+            return etag
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    etag = f'"{digest.hexdigest()}"'
+    with _etags_lock:
+        _etags[version] = etag
+        if len(_etags) > _ETAG_SLOTS:
+            _etags.popitem(last=False)
+    return etag
+
+
+def etag_matches(header, etag):
+    """If-None-Match comparison (weak, as RFC 9110 requires for this header)"""
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single-range header, or None to send the whole file
+
+    Multi-range and malformed headers are ignored, which RFC 9110 allows.
+    Raises RangeNotSatisfiable when the range starts past the end of the file.
+    """
+    if header is None:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and end < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def iter_file_range(path, start, end):
+    """Yield bytes start..end (inclusive) of a file in CHUNK_SIZE pieces"""
+    remaining = end - start + 1
+    with open(path, "rb") as f:
+        f.seek(start)
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,29 @@
+"""
+Key Term Highlighter
+Marks every key term in one pass with a cached, precompiled alternation regex
+"""
+
+import re
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1024)
+def _term_pattern(terms):
+    """One regex matching any of terms, longest alternative first"""
+    ordered = sorted({term for term in terms if term}, key=len, reverse=True)
+    if not ordered:
+        return None
+    return re.compile("|".join(re.escape(term) for term in ordered))
+
+
+def highlight_terms(text, terms, open_tag, close_tag):
+    """Wrap each occurrence of any term in open_tag/close_tag
+
+    The text is scanned once, left to right; where several terms start at the
+    same position the longest one wins, and inserted markup is never re-scanned.
+    Matching is case-sensitive, like the str.replace loop it replaces.
+    """
+    pattern = _term_pattern(tuple(terms))
+    if pattern is None:
+        return text
+    return pattern.sub(lambda match: f"{open_tag}{match.group(0)}{close_tag}", text)
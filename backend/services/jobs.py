@@ -0,0 +1,289 @@
+"""
+Generation Job Manager
+Runs PDF builds as background jobs with status polling and progress events
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import time
+import uuid
+
+from services.worker_pool import generation_pool
+
+# Job configuration (override through environment variables)
+MAX_ACTIVE_JOBS = int(os.getenv("ACADINTEL_MAX_JOBS", "256"))
+JOB_TTL_SECONDS = int(os.getenv("ACADINTEL_JOB_TTL", "3600"))
+PROGRESS_INTERVAL = float(os.getenv("ACADINTEL_PROGRESS_INTERVAL", "0.25"))  # seconds between updates
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class JobLimitError(Exception):
+    """Raised when too many jobs are queued or running"""
+
+
+class ProgressReporter:
+    """Picklable progress callback that forwards updates to the job manager
+
+    Each update is a round trip to the manager process, so at most one is sent per
+    interval; the first and the final (done == total) updates are always sent.
+    """
+
+    def __init__(self, channel, job_id, interval=PROGRESS_INTERVAL):
+        self.channel = channel
+        self.job_id = job_id
+        self.interval = interval
+        self._sent_at = None
+
+    def __call__(self, done, total, message):
+        now = time.monotonic()
+        if self._sent_at is not None and done < total and now - self._sent_at < self.interval:
+            return
+        self._sent_at = now
+        self.channel.put((self.job_id, done, total, message))
+
+
+class Job:
+    """State of one background generation"""
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.state = QUEUED
+        self.progress = {"done": 0, "total": 0, "message": "Waiting for a worker"}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.events = []  # (sequence, event, data): state changes and the latest progress only
+        self._sequence = 0
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self):
+        return self.state in (COMPLETED, FAILED)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+    def publish(self, event, data):
+        """Record an event and wake up any streaming listeners
+
+        A progress event replaces the previous one, so the log stays a few entries
+        long however many updates a build sends; late subscribers get the latest.
+        """
+        self._sequence += 1
+        if event == "progress":
+            self.events = [entry for entry in self.events if entry[1] != "progress"]
+        self.events.append((self._sequence, event, data))
+        self._changed.set()
+
+    def events_after(self, seen):
+        """Recorded events with a sequence number above `seen`, oldest first"""
+        return [entry for entry in self.events if entry[0] > seen]
+
+    async def wait_for_events(self, seen):
+        """Wait until an event newer than sequence number `seen` exists"""
+        while self._sequence <= seen:
+            self._changed.clear()
+            await self._changed.wait()
+
+
+class JobManager:
+    """Tracks jobs and runs them on the shared generation pool"""
+
+    def __init__(self, pool=generation_pool, max_active=MAX_ACTIVE_JOBS, ttl=JOB_TTL_SECONDS):
+        self.pool = pool
+        self.max_active = max_active
+        self.ttl = ttl
+        self.jobs = {}
+        self._channel = None
+        self._manager = None
+        self._pump_task = None
+        self._slots = None
+        self._by_key = {}
+
+    def _get_channel(self):
+        """Progress queue shared with workers (process-safe in process mode)"""
+        if self._channel is None:
+            if self.pool.mode == "process":
+                self._manager = multiprocessing.Manager()
+                self._channel = self._manager.Queue()
+            else:
+                self._channel = queue.Queue()
+        return self._channel
+
+    def _ensure_started(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool.max_workers)
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.get_running_loop().create_task(self._pump_progress())
+
+    async def _pump_progress(self):
+        """Forward progress messages from workers to job listeners"""
+        loop = asyncio.get_running_loop()
+        channel = self._get_channel()
+        while True:
+            message = await loop.run_in_executor(None, channel.get)
+            if message is None:
+                break
+            job_id, done, total, text = message
+            job = self.jobs.get(job_id)
+            if job is None or job.finished:
+                continue
+            job.progress = {"done": done, "total": total, "message": text}
+            job.publish("progress", job.progress)
+
+    def _prune(self):
+        """Forget finished jobs older than the TTL"""
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def active_count(self):
+        return sum(1 for job in self.jobs.values() if not job.finished)
+
+    def submit(self, kind, func, kwargs, on_result, dedupe_key=None):
+        """Queue func(**kwargs) as a job; on_result maps the raw result to the stored payload
+
+        If dedupe_key matches a job that is still queued or running, that job is returned
+        instead of starting a second identical build.
+        """
+        self._prune()
+        existing = self.active_job(dedupe_key)
+        if existing is not None:
+            return existing
+
+        if self.active_count() >= self.max_active:
+            raise JobLimitError(f"Too many active jobs ({self.max_active} max)")
+
+        self._ensure_started()
+        job = Job(kind)
+        self.jobs[job.id] = job
+        if dedupe_key is not None:
+            self._by_key[dedupe_key] = job.id
+        job.publish("state", {"state": job.state})
+
+        reporter = ProgressReporter(self._get_channel(), job.id)
+        asyncio.get_running_loop().create_task(
+            self._run(job, func, kwargs, reporter, on_result, dedupe_key)
+        )
+        return job
+
+    def start(self, kind, runner, dedupe_key=None):
+        """Run `await runner(job, progress)` as a job in this process
+
+        For jobs that schedule their own work on the pool (e.g. batches) rather
+        than being one build; progress(done, total, message) updates the job.
+        """
+        self._prune()
+        existing = self.active_job(dedupe_key)
+        if existing is not None:
+            return existing
+
+        if self.active_count() >= self.max_active:
+            raise JobLimitError(f"Too many active jobs ({self.max_active} max)")
+
+        job = Job(kind)
+        self.jobs[job.id] = job
+        if dedupe_key is not None:
+            self._by_key[dedupe_key] = job.id
+        job.state = RUNNING
+        job.publish("state", {"state": job.state})
+
+        def progress(done, total, message):
+            job.progress = {"done": done, "total": total, "message": message}
+            job.publish("progress", job.progress)
+
+        async def run():
+            try:
+                job.result = await runner(job, progress)
+                job.state = COMPLETED
+            except Exception as e:
+                job.error = str(e)
+                job.state = FAILED
+            self._finish(job, dedupe_key)
+
+        asyncio.get_running_loop().create_task(run())
+        return job
+
+    def active_job(self, dedupe_key):
+        """The queued or running job submitted with dedupe_key, if any"""
+        if dedupe_key is None:
+            return None
+        job = self.jobs.get(self._by_key.get(dedupe_key))
+        return job if job is not None and not job.finished else None
+
+    def completed(self, kind, result):
+        """Register a job whose result is already available (e.g. a cache hit)"""
+        self._prune()
+        job = Job(kind)
+        job.state = COMPLETED
+        job.result = result
+        job.progress = {"done": 1, "total": 1, "message": "Served from cache"}
+        job.finished_at = time.time()
+        self.jobs[job.id] = job
+        job.publish("state", {"state": job.state, "result": job.result, "error": job.error})
+        return job
+
+    async def _run(self, job, func, kwargs, reporter, on_result, dedupe_key=None):
+        async with self._slots:
+            job.state = RUNNING
+            job.publish("state", {"state": job.state})
+            try:
+                raw = await self.pool.run(func, progress_callback=reporter, **kwargs)
+                job.result = on_result(raw)
+                job.state = COMPLETED
+            except Exception as e:
+                job.error = str(e)
+                job.state = FAILED
+            self._finish(job, dedupe_key)
+
+    def _finish(self, job, dedupe_key):
+        job.finished_at = time.time()
+        if dedupe_key is not None and self._by_key.get(dedupe_key) == job.id:
+            del self._by_key[dedupe_key]
+        job.publish("state", {"state": job.state, "result": job.result, "error": job.error})
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    async def stream(self, job):
+        """Yield server-sent events for a job until it finishes"""
+        seen = 0
+        while True:
+            for sequence, event, data in job.events_after(seen):
+                seen = sequence
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            if job.finished:
+                break
+            await job.wait_for_events(seen)
+
+    def shutdown(self):
+        if self._channel is not None:
+            self._channel.put(None)
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+        self._channel = None
+
+
+# Shared job manager used by the API handlers
+job_manager = JobManager()
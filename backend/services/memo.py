@@ -0,0 +1,40 @@
+"""
+Identity Memo
+Thread-safe LRU of values derived from objects that are not changed after first use
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class IdentityMemo:
+    """LRU of compute(obj) results keyed by the object's identity
+
+    Only for objects treated as immutable once built (textbooks); mutable inputs
+    such as question lists must not be memoized this way. Each object is kept
+    alive alongside its value so its id() cannot be reused while cached.
+    Two threads missing at once may both compute; the first result is kept.
+    """
+
+    def __init__(self, slots):
+        self.slots = slots
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, obj, compute):
+        key = id(obj)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is obj:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        value = compute(obj)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is obj:
+                return entry[1]
+            self._entries[key] = (obj, value)
+            while len(self._entries) > self.slots:
+                self._entries.popitem(last=False)
+        return value
@@ -4,182 +4,117 @@ Converts questions into structured study material with chapter-wise organization
 """
 
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle, KeepTogether
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, KeepTogether
 from datetime import datetime
+import io
 import os
 import time
 from collections import defaultdict
+from concurrent.futures import as_completed
 
-def organize_by_chapters(questions, textbook):
-    """Organize questions into chapters based on topics"""
+from PyPDF2 import PdfReader, PdfWriter
+
+from services.highlighter import highlight_terms
+from services.pdf_fragments import fragment_cache
+from services.pdf_styles import get_theme
+from services.question_clusters import with_computed_frequencies
+from services.resolution_cache import resolution_cache
+from services.storage import output_storage
+from services.textbook_index import get_textbook_index
+from services.worker_pool import nested_pool, NESTED_WORKERS, REQUESTED_NESTED_WORKERS
+
+# Bump whenever the rendered output changes so cached PDFs are rebuilt
+GENERATOR_VERSION = "1.7"
+
+# Parallel chapter rendering (override through environment variables)
+# The chapter pool runs inside a generation worker, so it defaults to that worker's CPU share
+CHAPTER_WORKERS = int(os.getenv("ACADINTEL_CHAPTER_WORKERS", str(NESTED_WORKERS)))
+PARALLEL_CHAPTER_THRESHOLD = int(os.getenv("ACADINTEL_PARALLEL_CHAPTER_THRESHOLD", "8"))
+
+def select_topics(questions, topics, rankings=None):
+    """(questions, rankings) limited to questions tagged with any of topics
+
+    Topics match case-insensitively; rankings, if given, stay aligned with the
+    questions kept. No topics keeps everything.
+    """
+    if not topics:
+        return questions, rankings
+    wanted = {topic.lower() for topic in topics}
+    keep = [position for position, question in enumerate(questions)
+            if any(topic.lower() in wanted for topic in question.get('topics', []))]
+    return ([questions[position] for position in keep],
+            None if rankings is None else [rankings[position] for position in keep])
+
+def organize_by_chapters(questions, textbook, rankings=None):
+    """Organize questions into chapters based on their best-ranked textbook section
+
+    rankings are precomputed resolution_cache.rank() entries for questions.
+    """
     chapters = defaultdict(list)
+    index = get_textbook_index(textbook)
+    if rankings is None:
+        rankings = resolution_cache.rank(textbook, questions)
     
-    for question in questions:
-        question_topics = set(topic.lower() for topic in question.get('topics', []))
-        matched = False
-        
-        for chapter in textbook.get('chapters', []):
-            for section in chapter.get('sections', []):
-                section_title_lower = section['title'].lower()
-                if any(topic in section_title_lower for topic in question_topics):
-                    chapters[chapter['number']].append({
-                        'question': question,
-                        'chapter': chapter,
-                        'section': section
-                    })
-                    matched = True
-                    break
-            if matched:
-                break
+    for question, ranking in zip(questions, rankings):
+        match = index.best_section(ranking)
+        if match is not None:
+            chapter, section, score = match
+            chapters[chapter['number']].append({
+                'question': question,
+                'chapter': chapter,
+                'section': section,
+                'score': score
+            })
     
     return chapters
 
-def generate_notes_book(subject_name, questions, textbook, topics, settings):
-    """Generate exam-ready notes as a mini-book"""
-    start_time = time.time()
-    
-    # Create output directory
-    os.makedirs("output", exist_ok=True)
-    
-    # Generate filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"AcadIntel_StudyNotes_{subject_name.replace(' ', '_')}_{timestamp}.pdf"
-    filepath = os.path.join("output", filename)
-    
-    # Organize content by chapters
-    organized_content = organize_by_chapters(questions, textbook)
-    
-    # Create PDF
-    doc = SimpleDocTemplate(filepath, pagesize=A4,
-                           rightMargin=0.75*inch, leftMargin=0.75*inch,
-                           topMargin=0.75*inch, bottomMargin=0.75*inch)
-    
-    # Styles
-    styles = getSampleStyleSheet()
-    
-    # Custom styles for book-like appearance
-    book_title_style = ParagraphStyle(
-        'BookTitle',
-        parent=styles['Heading1'],
-        fontSize=28,
-        textColor=colors.HexColor('#195de6'),
-        spaceAfter=8,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    book_subtitle_style = ParagraphStyle(
-        'BookSubtitle',
-        parent=styles['Normal'],
-        fontSize=14,
-        textColor=colors.grey,
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Oblique'
-    )
-    
-    chapter_title_style = ParagraphStyle(
-        'ChapterTitle',
-        parent=styles['Heading1'],
-        fontSize=20,
-        textColor=colors.HexColor('#195de6'),
-        spaceAfter=12,
-        spaceBefore=20,
-        fontName='Helvetica-Bold',
-        borderPadding=10,
-        borderColor=colors.HexColor('#195de6'),
-        borderWidth=2,
-        backColor=colors.HexColor('#f0f2f4')
-    )
-    
-    section_title_style = ParagraphStyle(
-        'SectionTitle',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#111318'),
-        spaceAfter=10,
-        spaceBefore=15,
-        fontName='Helvetica-Bold',
-        leftIndent=10
-    )
-    
-    content_style = ParagraphStyle(
-        'Content',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=colors.black,
-        spaceAfter=12,
-        alignment=TA_JUSTIFY,
-        leading=16,
-        leftIndent=10,
-        rightIndent=10
-    )
-    
-    key_point_style = ParagraphStyle(
-        'KeyPoint',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.HexColor('#195de6'),
-        spaceAfter=6,
-        leftIndent=20,
-        bulletIndent=10,
-        fontName='Helvetica-Bold'
-    )
+def _new_document(target):
+    """A4 book layout shared by the whole book and by each chapter part"""
+    return SimpleDocTemplate(target, pagesize=A4,
+                             rightMargin=0.75*inch, leftMargin=0.75*inch,
+                             topMargin=0.75*inch, bottomMargin=0.75*inch)
+
+def _cover_page(subject_name, textbook, organized_content, theme):
+    """Cover page flowables, shared across builds with the same inputs"""
+    generated = datetime.now().strftime('%B %d, %Y')
+    key = (subject_name, textbook['title'], textbook['author'], textbook.get('edition', 'N/A'),
+           generated, len(organized_content), theme.dark)
     
-    source_style = ParagraphStyle(
-        'Source',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.HexColor('#636f88'),
-        spaceAfter=8,
-        fontName='Helvetica-Oblique',
-        leftIndent=10
-    )
+    def build():
+        book_subtitle_style = theme.notes['book_subtitle']
+        content = []
+        content.append(Spacer(1, 1.5*inch))
+        content.append(Paragraph(f"{subject_name}", theme.notes['book_title']))
+        content.append(Paragraph("Exam-Ready Study Notes", book_subtitle_style))
+        content.append(Spacer(1, 0.3*inch))
+        
+        # Book info box
+        info_data = [
+            ['Source Material', textbook['title']],
+            ['Author', textbook['author']],
+            ['Edition', textbook.get('edition', 'N/A')],
+            ['Generated', generated],
+            ['Topics Covered', str(len(organized_content))]
+        ]
+        
+        info_table = Table(info_data, colWidths=[2*inch, 3.5*inch])
+        info_table.setStyle(theme.tables['book_info'])
+        
+        content.append(info_table)
+        content.append(Spacer(1, 0.5*inch))
+        content.append(Paragraph(
+            "<i>Structured for exam preparation - Source-verified content - AI-enhanced organization</i>",
+            book_subtitle_style
+        ))
+        return content
     
-    # Build document content
+    return fragment_cache.get("notes_cover", key, build)
+
+def _table_of_contents(organized_content, theme):
+    """Table of contents flowables"""
     content = []
-    
-    # Cover page
-    content.append(Spacer(1, 1.5*inch))
-    content.append(Paragraph(f"{subject_name}", book_title_style))
-    content.append(Paragraph("Exam-Ready Study Notes", book_subtitle_style))
-    content.append(Spacer(1, 0.3*inch))
-    
-    # Book info box
-    info_data = [
-        ['Source Material', textbook['title']],
-        ['Author', textbook['author']],
-        ['Edition', textbook.get('edition', 'N/A')],
-        ['Generated', datetime.now().strftime('%B %d, %Y')],
-        ['Topics Covered', str(len(organized_content))]
-    ]
-    
-    info_table = Table(info_data, colWidths=[2*inch, 3.5*inch])
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f0f2f4')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('PADDING', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#195de6'))
-    ]))
-    
-    content.append(info_table)
-    content.append(Spacer(1, 0.5*inch))
-    content.append(Paragraph(
-        "<i>Structured for exam preparation - Source-verified content - AI-enhanced organization</i>",
-        book_subtitle_style
-    ))
-    content.append(PageBreak())
-    
-    # Table of Contents
-    content.append(Paragraph("Table of Contents", chapter_title_style))
+    content.append(Paragraph("Table of Contents", theme.notes['chapter_title']))
     content.append(Spacer(1, 0.2*inch))
     
     toc_data = []
@@ -193,123 +128,263 @@ def generate_notes_book(subject_name, questions, textbook, topics, settings):
                 f"{len(items)} topics"
             ])
     
-    toc_table = Table(toc_data, colWidths=[1.2*inch, 3.5*inch, 1*inch])
-    toc_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#195de6')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('PADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')])
-    ]))
+    # ReportLab rejects a table without rows, so an empty book gets no TOC table
+    if toc_data:
+        toc_table = Table(toc_data, colWidths=[1.2*inch, 3.5*inch, 1*inch])
+        toc_table.setStyle(theme.tables['toc'])
+        content.append(toc_table)
+    return content
+
+def _front_matter(subject_name, textbook, organized_content, theme):
+    """Cover page and table of contents"""
+    return (_cover_page(subject_name, textbook, organized_content, theme)
+            + [PageBreak()]
+            + _table_of_contents(organized_content, theme))
+
+def _chapter_content(chapter_num, items, textbook, settings, theme, first_topic):
+    """Flowables for one chapter; topics are numbered from first_topic"""
+    chapter_title_style = theme.notes['chapter_title']
+    section_title_style = theme.notes['section_title']
+    content_style = theme.notes['content']
+    key_point_style = theme.notes['key_point']
+    source_style = theme.notes['source']
+    content = []
+    sources_used = set()
     
-    content.append(toc_table)
-    content.append(PageBreak())
+    chapter_info = items[0]['chapter']
     
-    # Generate chapters
-    sources_used = set()
-    total_topics = 0
+    # Chapter title page
+    content.append(Spacer(1, 0.3*inch))
+    content.append(Paragraph(
+        f"Chapter {chapter_num}: {chapter_info['title']}",
+        chapter_title_style
+    ))
+    content.append(Spacer(1, 0.3*inch))
     
-    for chapter_num in sorted(organized_content.keys()):
-        items = organized_content[chapter_num]
-        if not items:
-            continue
-        
-        chapter_info = items[0]['chapter']
+    # Process each topic in the chapter
+    for topic_number, item in enumerate(items, first_topic):
+        question = item['question']
+        section = item['section']
         
-        # Chapter title page
-        content.append(Spacer(1, 0.3*inch))
+        # Topic title (derived from question)
         content.append(Paragraph(
-            f"Chapter {chapter_num}: {chapter_info['title']}",
-            chapter_title_style
+            f"Topic {topic_number}: {section['title']}",
+            section_title_style
         ))
-        content.append(Spacer(1, 0.3*inch))
         
-        # Process each topic in the chapter
-        for item in items:
-            total_topics += 1
-            question = item['question']
-            section = item['section']
-            
-            # Topic title (derived from question)
-            content.append(Paragraph(
-                f"Topic {total_topics}: {section['title']}",
-                section_title_style
-            ))
-            
-            # Core concept explanation
-            answer_text = section['content']
-            
-            # Highlight key terms if enabled
-            if settings.get('smart_highlights', True) and section.get('key_terms'):
-                for term in section['key_terms']:
-                    answer_text = answer_text.replace(
-                        term,
-                        f"<b><font color='#195de6'>{term}</font></b>"
-                    )
-            
-            content.append(Paragraph(answer_text.replace('\n', '<br/>'), content_style))
-            
-            # Key points box
-            if section.get('key_terms'):
-                content.append(Spacer(1, 0.1*inch))
-                content.append(Paragraph("<b>Key Terms:</b>", content_style))
-                for term in section['key_terms']:
-                    content.append(Paragraph(f"- {term}", key_point_style))
-            
-            # Exam relevance
-            exam_note = (f"<i>Exam Note: This topic appeared {question.get('frequency', 0)} times "
-                        f"in past papers with {question.get('weightage', 0)} marks weightage.</i>")
+        # Core concept explanation
+        answer_text = section['content']
+        
+        # Highlight key terms if enabled
+        if settings.get('smart_highlights', True) and section.get('key_terms'):
+            answer_text = highlight_terms(answer_text, section['key_terms'],
+                                          f"<b><font color='{theme.palette['primary']}'>", "</font></b>")
+        
+        content.append(Paragraph(answer_text.replace('\n', '<br/>'), content_style))
+        
+        # Key points box
+        if section.get('key_terms'):
             content.append(Spacer(1, 0.1*inch))
-            content.append(Paragraph(exam_note, source_style))
-            
-            # Source citation
-            if settings.get('include_citations', True):
-                citation = (f"<b>Source:</b> {textbook['title']}, "
-                          f"Chapter {chapter_num}, Page {section.get('page', 'N/A')}")
-                content.append(Paragraph(citation, source_style))
-                sources_used.add(textbook['title'])
-            
-            content.append(Spacer(1, 0.2*inch))
+            content.append(Paragraph("<b>Key Terms:</b>", content_style))
+            for term in section['key_terms']:
+                content.append(Paragraph(f"- {term}", key_point_style))
+        
+        # Exam relevance
+        exam_note = (f"<i>Exam Note: This topic appeared {question.get('frequency', 0)} times "
+                    f"in past papers with {question.get('weightage', 0)} marks weightage.</i>")
+        content.append(Spacer(1, 0.1*inch))
+        content.append(Paragraph(exam_note, source_style))
+        
+        # Source citation
+        if settings.get('include_citations', True):
+            citation = (f"<b>Source:</b> {textbook['title']}, "
+                      f"Chapter {chapter_num}, Page {section.get('page', 'N/A')}")
+            content.append(Paragraph(citation, source_style))
+            sources_used.add(textbook['title'])
         
-        # Chapter summary
         content.append(Spacer(1, 0.2*inch))
-        summary_text = f"<b>Chapter {chapter_num} Summary:</b> This chapter covered {len(items)} important exam topics. " \
-                      f"Focus on understanding the key concepts and practice related problems."
-        content.append(Paragraph(summary_text, content_style))
+    
+    # Chapter summary
+    content.append(Spacer(1, 0.2*inch))
+    summary_text = f"<b>Chapter {chapter_num} Summary:</b> This chapter covered {len(items)} important exam topics. " \
+                  f"Focus on understanding the key concepts and practice related problems."
+    content.append(Paragraph(summary_text, content_style))
+    
+    return content, sources_used
+
+def _closing_page(theme):
+    """Final "End of Study Notes" page, shared across builds on the same day"""
+    generated = datetime.now().strftime('%B %d, %Y')
+    
+    def build():
+        content = []
+        content.append(Spacer(1, 1*inch))
+        content.append(Paragraph("End of Study Notes", theme.notes['book_title']))
+        content.append(Spacer(1, 0.3*inch))
+        content.append(Paragraph(
+            "- Review all key terms highlighted in blue<br/>"
+            "- Practice questions from each chapter<br/>"
+            "- Focus on high-frequency topics<br/>"
+            "- Refer to source material for deeper understanding",
+            theme.notes['content']
+        ))
+        content.append(Spacer(1, 0.5*inch))
+        footer_text = f"Generated by AcadIntel AI - Exam-Focused Study Material - {generated}"
+        content.append(Paragraph(footer_text, theme.notes['source']))
+        return content
+    
+    return fragment_cache.get("notes_closing", (generated, theme.dark), build)
+
+def _render_part(content, theme):
+    """Render flowables to an in-memory PDF"""
+    buffer = io.BytesIO()
+    _new_document(buffer).build(content, onFirstPage=theme.draw_page, onLaterPages=theme.draw_page)
+    return buffer.getvalue()
+
+def _render_chapter_part(chapter_num, items, textbook, settings, first_topic):
+    """Worker entry point: render one chapter to PDF bytes"""
+    theme = get_theme(settings.get('dark_export', False))
+    content, sources_used = _chapter_content(chapter_num, items, textbook, settings, theme, first_topic)
+    return _render_part(content, theme), sources_used
+
+def _render_parallel(front, closing, chapter_jobs, textbook, settings, theme, progress_callback, workers):
+    """Render chapters in worker processes and stitch them between front matter and closing page
+
+    Returns a PdfWriter holding the merged book and the set of sources used.
+
+    The chapter pool lives only for this build: the notes build usually runs inside a
+    generation pool worker, and a long-lived nested pool would block that worker's exit.
+    """
+    parts = {}
+    sources_used = set()
+    with nested_pool(max(1, min(workers, len(chapter_jobs)))) as executor:
+        futures = {
+            executor.submit(_render_chapter_part, chapter_num, items, textbook, settings, first_topic): chapter_num
+            for chapter_num, items, first_topic in chapter_jobs
+        }
         
-        content.append(PageBreak())
+        # Front matter and closing page render here while the workers run
+        front_pdf = _render_part(front, theme)
+        closing_pdf = _render_part(closing, theme)
+        
+        for done, future in enumerate(as_completed(futures), 1):
+            pdf_bytes, chapter_sources = future.result()
+            parts[futures[future]] = pdf_bytes
+            sources_used |= chapter_sources
+            if progress_callback:
+                progress_callback(done, len(futures), f"Rendered chapter {done} of {len(futures)}")
     
-    # Final page
-    content.append(Spacer(1, 1*inch))
-    content.append(Paragraph("End of Study Notes", book_title_style))
-    content.append(Spacer(1, 0.3*inch))
-    content.append(Paragraph(
-        "- Review all key terms highlighted in blue<br/>"
-        "- Practice questions from each chapter<br/>"
-        "- Focus on high-frequency topics<br/>"
-        "- Refer to source material for deeper understanding",
-        content_style
-    ))
-    content.append(Spacer(1, 0.5*inch))
-    footer_text = f"Generated by AcadIntel AI - Exam-Focused Study Material - {datetime.now().strftime('%B %d, %Y')}"
-    content.append(Paragraph(footer_text, source_style))
+    if progress_callback:
+        progress_callback(len(chapter_jobs), len(chapter_jobs), "Merging chapters")
+    writer = PdfWriter()
+    for pdf_bytes in [front_pdf] + [parts[num] for num, _, _ in chapter_jobs] + [closing_pdf]:
+        writer.append(PdfReader(io.BytesIO(pdf_bytes)))
+    
+    return writer, sources_used
+
+def generate_notes_book(subject_name, questions, textbook, topics, settings, progress_callback=None,
+                        filename=None, parallel_chapters=None, in_memory=False, rankings=None):
+    """Generate exam-ready notes as a mini-book
+
+    filename overrides the default timestamped output name.
+    topics limits the book to questions tagged with any of them (case-insensitive);
+    None or empty covers every question.
+    rankings are precomputed resolution_cache.rank() entries for questions; without
+    them this process's resolution cache is consulted.
+    in_memory renders into a buffer instead of output storage: the result then carries
+    the document as `pdf_bytes` and `file_path` is None.
+    parallel_chapters renders each chapter in its own worker process and merges the
+    parts with PyPDF2; None enables it for books with PARALLEL_CHAPTER_THRESHOLD+ chapters
+    when the CHAPTER_WORKERS budget is more than one process. An explicit True always
+    gets at least two. The result's chapter_mode says which way the book was rendered.
+    progress_callback, if given, is called as progress_callback(done, total, message)
+    after each chapter and before the final layout pass.
+    """
+    start_time = time.time()
+    
+    # Generate filename
+    if filename is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"AcadIntel_StudyNotes_{subject_name.replace(' ', '_')}_{timestamp}.pdf"
+    
+    # Drop questions outside the requested topics before any resolution or layout
+    questions, rankings = select_topics(questions, topics, rankings)
+    
+    # Raise hand-entered frequencies to near-duplicate cluster sizes
+    questions = with_computed_frequencies(questions)
+    
+    # Organize content by chapters
+    organized_content = organize_by_chapters(questions, textbook, rankings)
+    
+    # Styles (shared per-process registry, light or dark)
+    theme = get_theme(settings.get('dark_export', False))
+    
+    # Number topics across the whole book before chapters are rendered
+    chapter_jobs = []
+    total_topics = 0
+    for chapter_num in sorted(organized_content.keys()):
+        items = organized_content[chapter_num]
+        if items:
+            chapter_jobs.append((chapter_num, items, total_topics + 1))
+            total_topics += len(items)
+    total_chapters = len(organized_content)
     
-    # Build PDF
-    doc.build(content)
+    front = _front_matter(subject_name, textbook, organized_content, theme)
+    closing = _closing_page(theme)
+    
+    if parallel_chapters is None:
+        workers = CHAPTER_WORKERS
+        parallel_chapters = len(chapter_jobs) >= PARALLEL_CHAPTER_THRESHOLD and workers > 1
+    else:
+        workers = max(REQUESTED_NESTED_WORKERS, CHAPTER_WORKERS)
+    chapter_mode = "parallel" if parallel_chapters and chapter_jobs else "in_place"
+    
+    if chapter_mode == "parallel":
+        writer, sources_used = _render_parallel(
+            front, closing, chapter_jobs, textbook, settings, theme, progress_callback, workers
+        )
+        with output_storage.writer(filename, in_memory) as target:
+            writer.write(target)
+        total_pages = len(writer.pages)
+    else:
+        # Build document content
+        content = front + [PageBreak()]
+        sources_used = set()
+        
+        for chapter_idx, (chapter_num, items, first_topic) in enumerate(chapter_jobs, 1):
+            chapter_content, chapter_sources = _chapter_content(
+                chapter_num, items, textbook, settings, theme, first_topic
+            )
+            content.extend(chapter_content)
+            content.append(PageBreak())
+            sources_used |= chapter_sources
+            
+            if progress_callback:
+                progress_callback(chapter_idx, total_chapters,
+                                  f"Processed chapter {chapter_idx} of {total_chapters}")
+        
+        content.extend(closing)
+        
+        # Build PDF (written to a temp file and renamed into place when complete)
+        if progress_callback:
+            progress_callback(total_chapters, total_chapters, "Rendering PDF")
+        with output_storage.writer(filename, in_memory) as target:
+            doc = _new_document(target)
+            doc.build(content, onFirstPage=theme.draw_page, onLaterPages=theme.draw_page)
+        total_pages = doc.page
     
     generation_time = round(time.time() - start_time, 2)
     
-    return {
-        "file_path": filepath,
+    result = {
+        "file_path": None if in_memory else output_storage.path(filename),
         "filename": filename,
-        "total_chapters": len(organized_content),
+        "total_chapters": total_chapters,
         "total_topics": total_topics,
-        "total_pages": "N/A",  # ReportLab doesn't provide page count easily
+        "total_pages": total_pages,
+        "chapter_mode": chapter_mode,
         "sources_used": list(sources_used),
         "generation_time": generation_time
     }
+    if in_memory:
+        result["pdf_bytes"] = target.getvalue()
+    return result
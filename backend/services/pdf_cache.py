@@ -0,0 +1,177 @@
+"""
+Generated PDF Cache
+Content-addressed cache of built PDFs; retention is left to the storage sweeper
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from services.memo import IdentityMemo
+from services.storage import output_storage, atomic_write, OUTPUT_DIR
+
+INDEX_FILENAME = ".pdf_cache_index.json"
+
+# Textbook fingerprints per textbook object
+_fingerprints = IdentityMemo(slots=64)
+
+
+def content_hash(value):
+    """Stable SHA-256 of any JSON-serialisable value"""
+    encoded = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def textbook_fingerprint(textbook):
+    """Content hash identifying a textbook version (memoized per textbook object)
+
+    Compiled corpora carry the fingerprint of the dict they were compiled from.
+    """
+    fingerprint = getattr(textbook, "fingerprint", None)
+    if fingerprint is not None:
+        return fingerprint
+    return _fingerprints.get(textbook, content_hash)
+
+
+def questions_fingerprint(questions):
+    """Content hash of a question list; question bank snapshots carry theirs precomputed"""
+    fingerprint = getattr(questions, "fingerprint", None)
+    if fingerprint is not None:
+        return fingerprint
+    return content_hash(questions)
+
+
+def generation_key(kind, generator_version, kwargs):
+    """Cache key for a generator call: hash of every input that affects the PDF"""
+    inputs = {
+        "kind": kind,
+        "generator_version": generator_version,
+    }
+    for name, value in kwargs.items():
+        # These change how a PDF is produced, not what it contains
+        if name in ("progress_callback", "filename", "parallel_chapters", "in_memory", "rankings"):
+            continue
+        if name == "textbook":
+            value = textbook_fingerprint(value)
+        elif name == "questions":
+            value = questions_fingerprint(value)
+        inputs[name] = value
+    return content_hash(inputs)
+
+
+class PdfCache:
+    """Maps generation keys to PDFs already written to output storage"""
+
+    def __init__(self, storage=output_storage, directory=OUTPUT_DIR):
+        self.storage = storage
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._dirty = False  # changes since the index was last written (see flush)
+        self._lock = threading.RLock()
+        storage.register(access_times=self.access_times, on_delete=self.forget)
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, INDEX_FILENAME)
+
+    def _load(self):
+        """Read the persisted index on first use"""
+        if self._entries is None:
+            self._entries = {}
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                pass
+        return self._entries
+
+    def _save(self):
+        self._dirty = False
+        os.makedirs(self.directory, exist_ok=True)
+        with atomic_write(self.index_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+
+    @staticmethod
+    def filename_for(prefix, subject_name, key):
+        """Content-addressed output filename for a cache key"""
+        return f"AcadIntel_{prefix}_{subject_name.replace(' ', '_')}_{key[:16]}.pdf"
+
+    def get(self, key):
+        """Return the stored generator result for key, or None on a miss"""
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(key)
+            if entry is None or not self.storage.exists(entry["filename"]):
+                if entry is not None:
+                    del entries[key]
+                    self._dirty = True
+                self.misses += 1
+                return None
+
+            # Persisted lazily (flush) so a hit never rewrites the index
+            entry["last_access"] = time.time()
+            self._dirty = True
+            self.hits += 1
+            return dict(entry["result"], cached=True)
+
+    def put(self, key, result):
+        """Record a freshly built PDF and let the sweeper check the storage budget
+
+        Called on the event loop, so the index is not written here: the sweeper
+        it wakes saves it from its own thread (flush), as does shutdown.
+        """
+        stored = self.storage.stat(result["filename"])
+        if stored is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._load()[key] = {
+                "filename": result["filename"],
+                "size": stored.size,
+                "created": now,
+                "last_access": now,
+                "result": result,
+            }
+            self._dirty = True
+        self.storage.request_sweep()
+
+    def flush(self):
+        """Write entries and access times changed since the index was last saved"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def access_times(self):
+        """Last cache hit per filename, used by the sweeper's LRU order (and saved for it)"""
+        with self._lock:
+            self.flush()
+            return {entry["filename"]: entry["last_access"] for entry in self._load().values()}
+
+    def forget(self, filenames):
+        """Drop entries whose PDFs the sweeper deleted"""
+        filenames = set(filenames)
+        with self._lock:
+            entries = self._load()
+            stale = [key for key, entry in entries.items() if entry["filename"] in filenames]
+            for key in stale:
+                del entries[key]
+            if stale:
+                self._save()
+
+    def stats(self):
+        with self._lock:
+            entries = self._load()
+            return {
+                "entries": len(entries),
+                "bytes": sum(entry["size"] for entry in entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Shared cache used by the API handlers
+pdf_cache = PdfCache()
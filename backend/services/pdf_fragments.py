@@ -0,0 +1,57 @@
+"""
+PDF Fragment Cache
+Pre-built flowables for static pages (cover, closing page, footer) reused across builds
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+# Fragment cache configuration (override through environment variables)
+FRAGMENT_SLOTS = int(os.getenv("ACADINTEL_FRAGMENT_SLOTS", "128"))
+
+
+class FragmentCache:
+    """LRU of flowable lists keyed by the inputs that shape them
+
+    Paragraph markup is parsed when a flowable is constructed, so reusing the
+    objects skips that work for pages whose text only depends on a few fields.
+    A build only stores layout results on them, which are the same for every
+    build with the same page size, so one list can serve many builds.
+    """
+
+    def __init__(self, slots=FRAGMENT_SLOTS):
+        self.slots = slots
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name, key, build):
+        """Flowables for fragment `name` with inputs `key`, calling build() on a miss
+
+        Returns a new list each time: doc.build() consumes the list it is given.
+        """
+        cache_key = (name,) + tuple(key)
+        with self._lock:
+            flowables = self._entries.get(cache_key)
+            if flowables is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return list(flowables)
+
+        flowables = build()
+        with self._lock:
+            self.misses += 1
+            self._entries[cache_key] = flowables
+            while len(self._entries) > self.slots:
+                self._entries.popitem(last=False)
+        return list(flowables)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# Per-process cache shared by both generators
+fragment_cache = FragmentCache()
@@ -0,0 +1,244 @@
+"""
+PDF Style Registry
+ReportLab paragraph and table styles for both generators, built once per process
+"""
+
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import TableStyle
+
+LIGHT_PALETTE = {
+    "page": None,
+    "primary": "#195de6",
+    "heading": "#111318",
+    "body": "#000000",
+    "muted": "#636f88",
+    "subtle": "#808080",
+    "panel": "#f0f2f4",
+    "row_alt": "#f9fafb",
+    "row": "#ffffff",
+    "grid": "#808080",
+    "on_primary": "#ffffff",
+}
+
+DARK_PALETTE = {
+    "page": "#111318",
+    "primary": "#6b9bff",
+    "heading": "#f0f2f4",
+    "body": "#e5e7eb",
+    "muted": "#9aa3b5",
+    "subtle": "#9ca3af",
+    "panel": "#1f2430",
+    "row_alt": "#181c25",
+    "row": "#111318",
+    "grid": "#3a4150",
+    "on_primary": "#ffffff",
+}
+
+
+class PdfTheme:
+    """Palette plus every style the generators use, for one colour scheme"""
+
+    def __init__(self, dark=False):
+        self.dark = dark
+        self.palette = DARK_PALETTE if dark else LIGHT_PALETTE
+        self.answer_key = {}
+        self.notes = {}
+        self.tables = {}
+        self._build()
+
+    def color(self, name):
+        return colors.HexColor(self.palette[name])
+
+    def draw_page(self, canvas, doc):
+        """Page callback: paint the page background for dark exports"""
+        if self.palette["page"] is None:
+            return
+        width, height = doc.pagesize if doc is not None else A4
+        canvas.saveState()
+        canvas.setFillColor(self.color("page"))
+        canvas.rect(0, 0, width, height, stroke=0, fill=1)
+        canvas.restoreState()
+
+    def _build(self):
+        styles = getSampleStyleSheet()
+        primary = self.color("primary")
+        heading = self.color("heading")
+        body = self.color("body")
+        muted = self.color("muted")
+        subtle = self.color("subtle")
+        panel = self.color("panel")
+
+        self.answer_key = {
+            "title": ParagraphStyle(
+                'CustomTitle',
+                parent=styles['Heading1'],
+                fontSize=24,
+                textColor=primary,
+                spaceAfter=12,
+                alignment=TA_CENTER,
+                fontName='Helvetica-Bold'
+            ),
+            "subtitle": ParagraphStyle(
+                'CustomSubtitle',
+                parent=styles['Normal'],
+                fontSize=12,
+                textColor=subtle,
+                spaceAfter=20,
+                alignment=TA_CENTER,
+                fontName='Helvetica-Oblique'
+            ),
+            "question": ParagraphStyle(
+                'Question',
+                parent=styles['Heading2'],
+                fontSize=14,
+                textColor=heading,
+                spaceAfter=8,
+                spaceBefore=12,
+                fontName='Helvetica-Bold'
+            ),
+            "answer": ParagraphStyle(
+                'Answer',
+                parent=styles['Normal'],
+                fontSize=11,
+                textColor=body,
+                spaceAfter=10,
+                alignment=TA_JUSTIFY,
+                leading=14
+            ),
+            "source": ParagraphStyle(
+                'Source',
+                parent=styles['Normal'],
+                fontSize=9,
+                textColor=muted,
+                spaceAfter=8,
+                fontName='Helvetica-Oblique'
+            ),
+            "badge": ParagraphStyle(
+                'Badge',
+                parent=styles['Normal'],
+                fontSize=8,
+                textColor=self.color("on_primary"),
+                spaceAfter=4
+            ),
+        }
+
+        self.notes = {
+            "book_title": ParagraphStyle(
+                'BookTitle',
+                parent=styles['Heading1'],
+                fontSize=28,
+                textColor=primary,
+                spaceAfter=8,
+                alignment=TA_CENTER,
+                fontName='Helvetica-Bold'
+            ),
+            "book_subtitle": ParagraphStyle(
+                'BookSubtitle',
+                parent=styles['Normal'],
+                fontSize=14,
+                textColor=subtle,
+                spaceAfter=30,
+                alignment=TA_CENTER,
+                fontName='Helvetica-Oblique'
+            ),
+            "chapter_title": ParagraphStyle(
+                'ChapterTitle',
+                parent=styles['Heading1'],
+                fontSize=20,
+                textColor=primary,
+                spaceAfter=12,
+                spaceBefore=20,
+                fontName='Helvetica-Bold',
+                borderPadding=10,
+                borderColor=primary,
+                borderWidth=2,
+                backColor=panel
+            ),
+            "section_title": ParagraphStyle(
+                'SectionTitle',
+                parent=styles['Heading2'],
+                fontSize=16,
+                textColor=heading,
+                spaceAfter=10,
+                spaceBefore=15,
+                fontName='Helvetica-Bold',
+                leftIndent=10
+            ),
+            "content": ParagraphStyle(
+                'Content',
+                parent=styles['Normal'],
+                fontSize=11,
+                textColor=body,
+                spaceAfter=12,
+                alignment=TA_JUSTIFY,
+                leading=16,
+                leftIndent=10,
+                rightIndent=10
+            ),
+            "key_point": ParagraphStyle(
+                'KeyPoint',
+                parent=styles['Normal'],
+                fontSize=10,
+                textColor=primary,
+                spaceAfter=6,
+                leftIndent=20,
+                bulletIndent=10,
+                fontName='Helvetica-Bold'
+            ),
+            "source": ParagraphStyle(
+                'Source',
+                parent=styles['Normal'],
+                fontSize=8,
+                textColor=muted,
+                spaceAfter=8,
+                fontName='Helvetica-Oblique',
+                leftIndent=10
+            ),
+        }
+
+        self.tables = {
+            "stats": TableStyle([
+                ('BACKGROUND', (0, 0), (-1, -1), panel),
+                ('TEXTCOLOR', (0, 0), (-1, -1), body),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+                ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 0), (-1, -1), 10),
+                ('PADDING', (0, 0), (-1, -1), 8),
+                ('GRID', (0, 0), (-1, -1), 0.5, self.color("grid"))
+            ]),
+            "book_info": TableStyle([
+                ('BACKGROUND', (0, 0), (-1, -1), panel),
+                ('TEXTCOLOR', (0, 0), (-1, -1), body),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+                ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 0), (-1, -1), 10),
+                ('PADDING', (0, 0), (-1, -1), 10),
+                ('GRID', (0, 0), (-1, -1), 1, primary)
+            ]),
+            "toc": TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), primary),
+                ('TEXTCOLOR', (0, 0), (-1, 0), self.color("on_primary")),
+                ('TEXTCOLOR', (0, 1), (-1, -1), body),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 11),
+                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 1), (-1, -1), 10),
+                ('PADDING', (0, 0), (-1, -1), 8),
+                ('GRID', (0, 0), (-1, -1), 0.5, self.color("grid")),
+                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [self.color("row"), self.color("row_alt")])
+            ]),
+        }
+
+
+@lru_cache(maxsize=None)
+def get_theme(dark=False):
+    """Shared light or dark theme, built on first use and reused by every build"""
+    return PdfTheme(dark=bool(dark))
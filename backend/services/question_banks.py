@@ -0,0 +1,308 @@
+"""
+Question Banks
+Per-subject past-paper questions: streaming JSONL/CSV uploads and indexes updated in place
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from services.question_clusters import QuestionClusterIndex
+from services.question_flags import QuestionFlags
+
+# Question bank configuration (override through environment variables)
+QUESTION_BANK_DIR = os.getenv("ACADINTEL_QUESTION_BANK_DIR", "question_banks")
+MAX_REPORTED_ERRORS = 50
+
+FORMATS = ("jsonl", "csv")
+_EXTENSION_FORMATS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "jsonl", ".csv": "csv"}
+_FILE_ID_RE = re.compile(r"^[a-z0-9][a-z0-9-]*$")
+_TOPIC_SPLIT_RE = re.compile(r"[;|]")
+
+# One lock per bank file: an evicted bank and its reloaded successor may both be in use
+_file_locks = defaultdict(threading.Lock)
+
+
+class QuestionBankError(ValueError):
+    """Raised for an upload that cannot be read at all (unknown format, missing columns)"""
+
+
+class InvalidQuestion(ValueError):
+    """Raised for a single record that fails validation; the upload continues"""
+
+
+def _integer(record, field, minimum=0):
+    value = record.get(field)
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise InvalidQuestion(f"{field} must be a number")
+    if isinstance(value, str):
+        try:
+            value = float(value.strip())
+        except ValueError:
+            raise InvalidQuestion(f"{field} must be a number")
+    if not isinstance(value, (int, float)) or value != int(value) or value < minimum:
+        raise InvalidQuestion(f"{field} must be a whole number of at least {minimum}")
+    return int(value)
+
+
+def _text(record, field):
+    value = record.get(field)
+    if value is None:
+        return None
+    if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+        raise InvalidQuestion(f"{field} must be a string")
+    return " ".join(str(value).split()) or None
+
+
+def validate_question(record, subject_id):
+    """Question dict in the DEMO_QUESTIONS layout for an uploaded record
+
+    Only `text` is required. Records without an `id` get one derived from their
+    text, so re-uploading the same file adds nothing.
+    """
+    if not isinstance(record, dict):
+        raise InvalidQuestion("record must be an object")
+    text = _text(record, "text")
+    if text is None:
+        raise InvalidQuestion("text is required")
+
+    question_id = _text(record, "id") or f"{subject_id}-{hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]}"
+    question = {"id": question_id, "text": text}
+    for field in ("exam", "difficulty"):
+        value = _text(record, field)
+        if value is not None:
+            question[field] = value
+    for field in ("year", "weightage", "frequency"):
+        value = _integer(record, field)
+        if value is not None:
+            question[field] = value
+
+    topics = record.get("topics")
+    if isinstance(topics, str):
+        topics = _TOPIC_SPLIT_RE.split(topics)
+    if topics is None:
+        topics = []
+    if not isinstance(topics, list) or not all(isinstance(topic, str) for topic in topics):
+        raise InvalidQuestion("topics must be a list of strings")
+    question["topics"] = [topic.strip() for topic in topics if topic.strip()]
+    return question
+
+
+def bank_format(filename=None, requested=None):
+    """Upload format from an explicit choice or the file extension"""
+    if requested:
+        if requested.lower() not in FORMATS:
+            raise QuestionBankError(f"Unsupported format {requested!r}; use one of {', '.join(FORMATS)}")
+        return requested.lower()
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension not in _EXTENSION_FORMATS:
+        raise QuestionBankError("Cannot tell the format from the file name; pass format=jsonl or format=csv")
+    return _EXTENSION_FORMATS[extension]
+
+
+def iter_records(binary_file, fmt):
+    """Yield (line number, record or InvalidQuestion) from an upload, one record at a time
+
+    The file is decoded as it is read, so memory use does not depend on its size.
+    """
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        if fmt == "jsonl":
+            for line_number, line in enumerate(text, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as e:
+                    yield line_number, InvalidQuestion(f"invalid JSON: {e}")
+        else:
+            reader = csv.DictReader(text)
+            if reader.fieldnames is None or "text" not in reader.fieldnames:
+                raise QuestionBankError("CSV uploads need a header row with a text column")
+            for row in reader:
+                yield reader.line_num, row
+    finally:
+        text.detach()  # leave the upload's file open for its owner
+
+
+class QuestionList(list):
+    """Questions carrying a fingerprint of their contents
+
+    Cache keys use the fingerprint instead of hashing every question on each request.
+    """
+
+    def __init__(self, questions, fingerprint):
+        super().__init__(questions)
+        self.fingerprint = fingerprint
+
+
+class QuestionBank:
+    """A subject's questions with their cluster, flag and topic indexes
+
+    Adding a question updates the indexes in place rather than rebuilding them.
+    The clusters it touched are re-annotated (computed frequency and flags) once,
+    on the next read, so a large upload into a big cluster stays linear.
+    `questions` is a snapshot list in the annotated layout the generators
+    expect, replaced (not mutated) after every change so in-flight builds keep
+    a consistent view. Snapshots carry a fingerprint: a running hash of every
+    question added, kept up to date as the bank grows.
+    """
+
+    def __init__(self, subject_id, questions=()):
+        self.subject_id = subject_id
+        self.size = 0  # estimated bytes, for the subject registry's LRU
+        self._raw = []
+        self._annotated = []
+        self._positions = {}
+        self._clusters = QuestionClusterIndex()
+        self._flags = QuestionFlags()
+        self._topics = defaultdict(list)
+        self._dirty = set()  # ids whose cluster changed since the last read
+        self._snapshot = []
+        # Annotations depend on the clustering threshold as well as the questions
+        self._digest = hashlib.sha256(f"clusters:{self._clusters.threshold}\n".encode("utf-8"))
+        self._lock = threading.RLock()
+        for question in questions:
+            self.add(question)
+
+    def __len__(self):
+        return len(self._raw)
+
+    def __contains__(self, question_id):
+        return question_id in self._positions
+
+    def add(self, question):
+        """Index a validated question; False if its id is already in the bank"""
+        with self._lock:
+            question_id = question["id"]
+            if question_id in self._positions:
+                return False
+            position = len(self._raw)
+            self._positions[question_id] = position
+            self._raw.append(question)
+            self._annotated.append(None)
+            self._flags.set(position, question)  # provisional until the next refresh
+            self._clusters.add(question)
+            self._dirty.add(question_id)
+            for topic in question.get("topics", []):
+                self._topics[topic.lower()].append(position)
+            encoded = json.dumps(question, sort_keys=True, ensure_ascii=False)
+            self._digest.update(encoded.encode("utf-8") + b"\n")
+            self.size += len(encoded)
+            self._snapshot = None
+            return True
+
+    def _refresh(self):
+        """Re-annotate every member of the clusters that grew since the last read"""
+        roots = {self._clusters.cluster_id(question_id) for question_id in self._dirty}
+        self._dirty.clear()
+        for root in roots:
+            # Joining a cluster changes the computed frequency of every member
+            for member in self._clusters.members(root):
+                position = self._positions[member]
+                annotated = self._clusters.annotate(self._raw[position])
+                self._annotated[position] = annotated
+                self._flags.set(position, annotated)
+
+    @property
+    def questions(self):
+        with self._lock:
+            self._refresh()
+            if self._snapshot is None:
+                self._snapshot = QuestionList(self._annotated, self._digest.hexdigest())
+            return self._snapshot
+
+    def topic_questions(self, topics):
+        """Annotated questions tagged with any of topics (case-insensitive), in bank order
+
+        Read from the topic index, so the cost tracks the matching questions, not the bank.
+        """
+        with self._lock:
+            self._refresh()
+            topics = sorted({topic.lower() for topic in topics})
+            positions = {position
+                         for topic in topics
+                         for position in self._topics.get(topic, ())}
+            fingerprint = hashlib.sha256(
+                json.dumps([self._digest.hexdigest(), topics], ensure_ascii=False).encode("utf-8")
+            ).hexdigest()
+            return QuestionList([self._annotated[position] for position in sorted(positions)], fingerprint)
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            return dict(
+                self._flags.counts(),
+                subject_id=self.subject_id,
+                total_questions=len(self._raw),
+                clusters=len(self._clusters.clusters()),
+                topics=len(self._topics),
+            )
+
+
+def bank_path(subject_id):
+    if not _FILE_ID_RE.match(subject_id):
+        raise QuestionBankError(f"Subject id {subject_id!r} cannot name a question bank file")
+    return os.path.join(QUESTION_BANK_DIR, f"{subject_id}.jsonl")
+
+
+def load_question_bank(subject_id, base_questions=()):
+    """A subject's built-in questions followed by every question uploaded for it"""
+    bank = QuestionBank(subject_id, base_questions)
+    path = bank_path(subject_id)
+    try:
+        with _file_locks[path], open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    bank.add(json.loads(line))
+    except FileNotFoundError:
+        pass
+    return bank
+
+
+def ingest_question_bank(bank, binary_file, fmt):
+    """Validate an upload record by record, adding new questions to bank and its file
+
+    Invalid records are skipped and reported (the first MAX_REPORTED_ERRORS of
+    them); questions whose id the bank already has are counted as duplicates.
+    """
+    start_time = time.time()
+    added = duplicates = rejected = 0
+    errors = []
+    path = bank_path(bank.subject_id)
+    os.makedirs(QUESTION_BANK_DIR, exist_ok=True)
+    # Only the file is held for the whole upload; readers see the bank grow question by question
+    with _file_locks[path], open(path, "a", encoding="utf-8") as out:
+        for line_number, record in iter_records(binary_file, fmt):
+            try:
+                if isinstance(record, InvalidQuestion):
+                    raise record
+                question = validate_question(record, bank.subject_id)
+            except InvalidQuestion as e:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": line_number, "error": str(e)})
+                continue
+            if bank.add(question):
+                out.write(json.dumps(question, ensure_ascii=False) + "\n")
+                added += 1
+            else:
+                duplicates += 1
+
+    return dict(
+        bank.stats(),
+        added=added,
+        duplicates=duplicates,
+        rejected=rejected,
+        errors=errors,
+        ingestion_time=round(time.time() - start_time, 2),
+    )
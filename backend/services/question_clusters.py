@@ -0,0 +1,167 @@
+"""
+Question Clustering
+Groups near-duplicate past-paper questions with MinHash signatures and LSH banding
+"""
+
+import hashlib
+import os
+import random
+from collections import defaultdict
+
+from services.textbook_index import tokenize
+
+# Clustering configuration (override through environment variables)
+# Rewordings of a 4-6 word question ("What is X? Discuss its Y." / "Explain X.") score 0.7-0.8;
+# questions that only share a subject ("wave function" / "wave function collapse") score < 0.7
+SIMILARITY_THRESHOLD = float(os.getenv("ACADINTEL_CLUSTER_THRESHOLD", "0.7"))
+# 80 permutations in 20 bands of 4: pairs at 0.7 share a bucket with p > 0.99, pairs
+# at 0.3 (questions on a common topic) with p ~ 0.15, so buckets stay small
+NUM_BANDS = 20
+ROWS_PER_BAND = 4
+NUM_PERM = NUM_BANDS * ROWS_PER_BAND
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(1729)  # fixed seed: signatures must be stable across processes
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+                 for _ in range(NUM_PERM)]
+
+
+def question_shingles(question):
+    """Content words of a question (falls back to its topics for very short texts)"""
+    shingles = set(tokenize(question.get('text', '')))
+    if not shingles:
+        shingles = {token for topic in question.get('topics', []) for token in tokenize(topic)}
+    return frozenset(shingles)
+
+
+def _shingle_hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "big")
+
+
+def minhash_signature(shingles):
+    """NUM_PERM min-hashes of a shingle set"""
+    if not shingles:
+        return (_MAX_HASH,) * NUM_PERM
+    hashes = [_shingle_hash(shingle) for shingle in shingles]
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    )
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class QuestionClusterIndex:
+    """Incremental near-duplicate clustering
+
+    Each cluster is represented by its first question, and only representatives
+    are stored in the LSH band buckets. A new question is compared (exact
+    Jaccard) with the representatives it shares a bucket with and joins the
+    most similar one at or above the threshold, or starts a cluster of its own.
+    Matches therefore never chain through intermediate questions, and buckets
+    grow with the number of distinct questions rather than the bank size.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self._shingles = {}  # representative -> shingles
+        self._order = {}  # representative -> creation order, for deterministic ties
+        self._cluster = {}  # question id -> representative
+        self._members = {}  # representative -> member ids, representative first
+        self._buckets = [defaultdict(list) for _ in range(NUM_BANDS)]
+
+    def __len__(self):
+        return len(self._cluster)
+
+    def add(self, question):
+        """Insert a question into the cluster of its most similar representative, if any"""
+        qid = question['id']
+        if qid in self._cluster:
+            return
+        shingles = question_shingles(question)
+        if not shingles:
+            # Nothing to compare; an empty signature would put every such question in one bucket
+            self._cluster[qid] = qid
+            self._members[qid] = [qid]
+            return
+
+        signature = minhash_signature(shingles)
+        keys = [signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND] for band in range(NUM_BANDS)]
+        candidates = set()
+        for buckets, key in zip(self._buckets, keys):
+            candidates.update(buckets.get(key, ()))
+
+        best, best_similarity = None, self.threshold
+        for representative in sorted(candidates, key=self._order.__getitem__):
+            similarity = jaccard(shingles, self._shingles[representative])
+            if similarity > best_similarity or (best is None and similarity == best_similarity):
+                best, best_similarity = representative, similarity
+
+        if best is not None:
+            self._cluster[qid] = best
+            self._members[best].append(qid)
+            return
+
+        self._cluster[qid] = qid
+        self._members[qid] = [qid]
+        self._shingles[qid] = shingles
+        self._order[qid] = len(self._order)
+        for buckets, key in zip(self._buckets, keys):
+            buckets[key].append(qid)
+
+    def add_many(self, questions):
+        for question in questions:
+            self.add(question)
+        return self
+
+    def cluster_size(self, qid):
+        """Number of indexed questions in qid's cluster (1 if it has no near-duplicates)"""
+        if qid not in self._cluster:
+            return 0
+        return len(self._members[self._cluster[qid]])
+
+    def cluster_id(self, qid):
+        return self._cluster[qid]
+
+    def members(self, qid):
+        """Ids of every question in qid's cluster, qid included"""
+        if qid not in self._cluster:
+            return []
+        return list(self._members[self._cluster[qid]])
+
+    def clusters(self):
+        """Clusters with more than one member, as lists of question ids"""
+        return [list(members) for members in self._members.values() if len(members) > 1]
+
+    def frequency(self, question):
+        """Times a question has been asked: the hand-entered count or its cluster size, whichever is larger"""
+        return max(question.get('frequency', 0), self.cluster_size(question['id']))
+
+    def annotate(self, question):
+        """Copy of question with its computed frequency, reported frequency and cluster size"""
+        return dict(
+            question,
+            frequency=self.frequency(question),
+            reported_frequency=question.get('frequency', 0),
+            cluster_size=self.cluster_size(question['id'])
+        )
+
+
+def with_computed_frequencies(questions):
+    """Copies of the questions with `frequency` raised to their near-duplicate cluster size
+
+    The hand-entered value is kept as `reported_frequency` and `cluster_size` is
+    added. Lists that are already annotated (a subject's question bank keeps its
+    questions annotated) are returned unchanged; anything else is clustered on
+    every call, as a list may have changed since it was last seen.
+    """
+    if all('cluster_size' in question for question in questions):
+        return questions
+
+    index = QuestionClusterIndex().add_many(questions)
+    return [index.annotate(question) for question in questions]
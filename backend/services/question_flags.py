@@ -0,0 +1,95 @@
+"""
+Question Classification
+Single-pass per-question flags (repeated, high weightage, frequency bucket)
+"""
+
+from array import array
+from collections import Counter
+
+REPEATED_FREQUENCY = 3  # appeared 3+ times
+HIGH_WEIGHTAGE_MARKS = 10
+FREQUENT_FREQUENCY = 4  # shown with an "Asked N times" badge
+
+# Flag bits; the frequency bucket lives in the two bits above them
+REPEATED = 0x1
+HIGH_WEIGHTAGE = 0x2
+BUCKET_SHIFT = 2
+
+BUCKET_SINGLE = 0     # asked at most once
+BUCKET_RECURRING = 1  # asked twice
+BUCKET_REPEATED = 2   # asked REPEATED_FREQUENCY times
+BUCKET_FREQUENT = 3   # asked FREQUENT_FREQUENCY or more times
+BUCKET_NAMES = ("single", "recurring", "repeated", "frequent")
+
+
+def frequency_bucket(frequency):
+    if frequency >= FREQUENT_FREQUENCY:
+        return BUCKET_FREQUENT
+    if frequency >= REPEATED_FREQUENCY:
+        return BUCKET_REPEATED
+    if frequency >= 2:
+        return BUCKET_RECURRING
+    return BUCKET_SINGLE
+
+
+def question_flags(question):
+    """Flags byte of a single question"""
+    frequency = question.get('frequency', 0)
+    value = frequency_bucket(frequency) << BUCKET_SHIFT
+    if frequency >= REPEATED_FREQUENCY:
+        value |= REPEATED
+    if question.get('weightage', 0) >= HIGH_WEIGHTAGE_MARKS:
+        value |= HIGH_WEIGHTAGE
+    return value
+
+
+class QuestionFlags:
+    """One flags byte per question, in question-list order, plus totals"""
+
+    def __init__(self, flags=None, repeated=0, high_weightage=0, buckets=None):
+        self._flags = array('B') if flags is None else flags
+        self.repeated = repeated
+        self.high_weightage = high_weightage
+        self.buckets = [0, 0, 0, 0] if buckets is None else buckets
+
+    def __len__(self):
+        return len(self._flags)
+
+    def is_repeated(self, position):
+        return bool(self._flags[position] & REPEATED)
+
+    def is_high_weightage(self, position):
+        return bool(self._flags[position] & HIGH_WEIGHTAGE)
+
+    def bucket(self, position):
+        return self._flags[position] >> BUCKET_SHIFT
+
+    def set(self, position, question):
+        """Reclassify the question at position (position == len(self) appends), keeping totals current"""
+        value = question_flags(question)
+        if position == len(self._flags):
+            self._flags.append(value)
+        else:
+            self._count(self._flags[position], -1)
+            self._flags[position] = value
+        self._count(value, 1)
+
+    def _count(self, value, delta):
+        self.repeated += delta * (value & REPEATED)
+        self.high_weightage += delta * ((value & HIGH_WEIGHTAGE) >> 1)
+        self.buckets[value >> BUCKET_SHIFT] += delta
+
+    def counts(self):
+        return {
+            "repeated": self.repeated,
+            "high_weightage": self.high_weightage,
+            "frequency_buckets": dict(zip(BUCKET_NAMES, self.buckets)),
+        }
+
+
+def classify_questions(questions):
+    """Flags for every question (via question_flags), computed in one pass over the list"""
+    result = QuestionFlags(array('B', map(question_flags, questions)))
+    for value, count in Counter(result._flags).items():
+        result._count(value, count)
+    return result
@@ -0,0 +1,109 @@
+"""
+Question Resolution Cache
+Memoized question -> textbook section rankings, shared by both generators
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from services.pdf_cache import textbook_fingerprint
+from services.textbook_index import get_textbook_index
+
+# Resolution cache configuration (override through environment variables)
+RESOLUTION_SLOTS = int(os.getenv("ACADINTEL_RESOLUTION_SLOTS", "100000"))
+LIST_SLOTS = 64  # whole ranking lists of fingerprinted question lists (bank snapshots)
+
+# Bump whenever TextbookIndex.rank() scores change so cached rankings are recomputed
+RESOLUTION_VERSION = "1"
+
+
+def question_digest(question):
+    """Hash of the fields a ranking depends on: the question's wording and topics"""
+    encoded = json.dumps([question.get('text', ''), question.get('topics', [])], ensure_ascii=False)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+class ResolutionCache:
+    """LRU of TextbookIndex.rank() entries keyed by textbook and question content
+
+    Keys are (resolution version, textbook fingerprint, question id, digest of
+    its text and topics), so editing a textbook or a question simply misses;
+    the stale entries age out of the LRU. Misses are ranked together in one
+    batch, as TextbookIndex.rank() is fastest that way. Question lists with a
+    fingerprint (question bank snapshots) also cache their whole ranking list,
+    so an unchanged bank is not re-digested question by question.
+    """
+
+    def __init__(self, slots=RESOLUTION_SLOTS):
+        self.slots = slots
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lists = OrderedDict()
+        self._lock = threading.Lock()
+
+    def rank(self, textbook, questions):
+        """Rankings for questions (one rank() entry per question, in order)"""
+        fingerprint = textbook_fingerprint(textbook)
+        list_key = None
+        if getattr(questions, "fingerprint", None) is not None:
+            list_key = (RESOLUTION_VERSION, fingerprint, questions.fingerprint)
+            with self._lock:
+                rankings = self._lists.get(list_key)
+                if rankings is not None:
+                    self._lists.move_to_end(list_key)
+                    self.hits += len(questions)
+                    return rankings
+
+        keys = [(RESOLUTION_VERSION, fingerprint, question['id'], question_digest(question))
+                for question in questions]
+        rankings = [None] * len(questions)
+        missing = []
+        with self._lock:
+            for position, key in enumerate(keys):
+                ranking = self._entries.get(key)
+                if ranking is None:
+                    missing.append(position)
+                else:
+                    self._entries.move_to_end(key)
+                    rankings[position] = ranking
+            self.hits += len(questions) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            fresh = get_textbook_index(textbook).rank([questions[position] for position in missing])
+            with self._lock:
+                for position, ranking in zip(missing, fresh):
+                    rankings[position] = ranking
+                    self._entries[keys[position]] = ranking
+                while len(self._entries) > self.slots:
+                    self._entries.popitem(last=False)
+        if list_key is not None:
+            with self._lock:
+                self._lists[list_key] = rankings
+                while len(self._lists) > LIST_SLOTS:
+                    self._lists.popitem(last=False)
+        return rankings
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._lists.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "slots": self.slots,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Per-process cache; the API process fills it before handing builds to workers
+resolution_cache = ResolutionCache()
@@ -0,0 +1,157 @@
+"""
+Textbook Search
+Ranked section search with phrase matching and cited snippets over compiled corpora
+"""
+
+import re
+from collections import Counter, defaultdict
+
+from services.textbook_index import (
+    TOKEN_RE, STOPWORDS, FIELD_SHIFT, FIELD_CONTENT, ORDINAL_MASK, tokenize
+)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+SNIPPET_WORDS = 30
+SNIPPET_LEAD = 5  # words shown before the first hit in a snippet
+
+_PHRASE_RE = re.compile(r'"([^"]*)"')
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class SearchQueryError(ValueError):
+    """Raised for a query with no searchable words"""
+
+
+def parse_query(query):
+    """(terms, phrases) of a query; phrases are lists of (word offset, term) pairs
+
+    Quoted text must appear as a phrase; everything else is ranked by BM25.
+    Stopwords inside a phrase are skipped but still count towards word offsets.
+    """
+    phrases = []
+    for text in _PHRASE_RE.findall(query):
+        words = [(offset, token.lower()) for offset, token in enumerate(TOKEN_RE.findall(text))]
+        words = [(offset, token) for offset, token in words if token not in STOPWORDS]
+        if words:
+            base = words[0][0]
+            phrases.append([(offset - base, token) for offset, token in words])
+
+    terms = list(dict.fromkeys(tokenize(query.replace('"', " "))))
+    if not terms:
+        raise SearchQueryError("Query has no searchable words")
+    return terms, phrases
+
+
+def _contains_phrase(corpus, section_position, phrase):
+    """Whether the words of phrase occur at their offsets within one field of a section"""
+    following = [(offset, set(corpus.term_positions(term, section_position)))
+                 for offset, term in phrase[1:]]
+    for start in corpus.term_positions(phrase[0][1], section_position):
+        if all(start + offset in positions for offset, positions in following):
+            return True
+    return False
+
+
+def _snippet(content, hits):
+    """Snippet around the densest run of hit word ordinals, with hit spans relative to it"""
+    if hits:
+        # Sliding window over the sorted hits: most distinct terms, then earliest
+        hit_words = sorted(hits)
+        width = SNIPPET_WORDS - SNIPPET_LEAD
+        in_window = Counter()
+        best_start, best_terms = hit_words[0][0], 0
+        end_index = 0
+        for first, term in hit_words:
+            while end_index < len(hit_words) and hit_words[end_index][0] < first + width:
+                in_window[hit_words[end_index][1]] += 1
+                end_index += 1
+            if len(in_window) > best_terms:
+                best_start, best_terms = first, len(in_window)
+            in_window[term] -= 1
+            if not in_window[term]:
+                del in_window[term]
+        first_word = max(0, best_start - SNIPPET_LEAD)
+    else:
+        first_word = 0
+    last_word = first_word + SNIPPET_WORDS
+
+    # Rebuilt word by word so runs of whitespace collapse and hit offsets stay exact
+    hit_ordinals = {ordinal for ordinal, _ in hits}
+    pieces, spans = [], []
+    length = 0
+    previous_end = None
+    for ordinal, match in enumerate(TOKEN_RE.finditer(content)):
+        if ordinal >= last_word:
+            pieces.append("…")
+            break
+        if ordinal < first_word:
+            continue
+        if previous_end is None:
+            piece = "…" if match.start() > 0 else ""
+        else:
+            piece = _WHITESPACE_RE.sub(" ", content[previous_end:match.start()])
+        pieces.append(piece)
+        length += len(piece)
+        if ordinal in hit_ordinals:
+            spans.append([length, length + len(match.group(0))])
+        pieces.append(match.group(0))
+        length += len(match.group(0))
+        previous_end = match.end()
+    else:
+        if previous_end is not None:
+            pieces.append(content[previous_end:].rstrip())
+    return "".join(pieces), spans
+
+
+def search_textbook(corpus, query, limit=DEFAULT_LIMIT):
+    """Best-matching sections of a compiled textbook for a free-text query
+
+    Sections are scored with the corpus's prebuilt BM25 impacts, term at a time;
+    sections missing a quoted phrase are dropped. Only the returned sections are
+    read for snippets, so cost tracks the query's posting lists, not the book.
+    """
+    terms, phrases = parse_query(query)
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    scores = defaultdict(float)
+    for term in terms:
+        for position, impact in corpus.bm25_impacts.get(term, ()):
+            scores[position] += impact
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    results = []
+    matched = 0
+    for position, score in ranked:
+        if any(not _contains_phrase(corpus, position, phrase) for phrase in phrases):
+            continue
+        matched += 1
+        if len(results) < limit:
+            results.append(_result(corpus, position, score, terms))
+    return {"total": matched, "results": results}
+
+
+def _result(corpus, position, score, terms):
+    section = corpus.section_list[position]
+    chapter = corpus.chapter_of(position)
+    hits = [(encoded & ORDINAL_MASK, term)
+            for term in terms
+            for encoded in corpus.term_positions(term, position)
+            if encoded >> FIELD_SHIFT == FIELD_CONTENT]
+    snippet, highlights = _snippet(section["content"], hits)
+    return {
+        "score": round(score, 4),
+        "chapter": chapter["number"],
+        "chapter_title": chapter["title"],
+        "section": section["title"],
+        "page": section.get("page", "N/A"),
+        "snippet": snippet,
+        "highlights": highlights,
+        "source": {
+            "book": corpus["title"],
+            "author": corpus["author"],
+            "chapter": chapter["number"],
+            "section": section["title"],
+            "page": section.get("page", "N/A"),
+        },
+    }
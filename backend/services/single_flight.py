@@ -0,0 +1,35 @@
+"""
+Single-Flight Request Coalescing
+Concurrent callers with the same key share one in-flight build
+"""
+
+import asyncio
+
+
+class SingleFlight:
+    """Deduplicates concurrent async work by key"""
+
+    def __init__(self):
+        self._inflight = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key, coro_factory):
+        """Await coro_factory() once per key; concurrent callers receive the same result"""
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            # A separate task keeps the build alive if the first caller goes away
+            task = asyncio.ensure_future(coro_factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {
+            "in_flight": len(self._inflight),
+            "builds": self.leaders,
+            "coalesced": self.followers,
+        }
@@ -0,0 +1,291 @@
+"""
+Output Storage
+Atomic PDF writes, a background retention sweeper and pluggable storage backends
+"""
+
+import io
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+
+from services.downloads import safe_output_path
+
+# Storage configuration (override through environment variables)
+OUTPUT_DIR = "output"
+STORAGE_MAX_BYTES = int(os.getenv("ACADINTEL_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+STORAGE_MAX_AGE = int(os.getenv("ACADINTEL_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+SUBJECT_MAX_BYTES = int(os.getenv("ACADINTEL_SUBJECT_MAX_BYTES", str(100 * 1024 * 1024)))
+SWEEP_INTERVAL = int(os.getenv("ACADINTEL_SWEEP_INTERVAL", "300"))
+TEMP_MAX_AGE = 3600  # temp files older than this belong to crashed builds
+
+# AcadIntel_{AnswerKey|StudyNotes}_{subject}_{content key or timestamp}.pdf
+_OUTPUT_NAME_RE = re.compile(r"^AcadIntel_(?:AnswerKey|StudyNotes)_(.+)_(?:[0-9a-f]{16}|\d{8}_\d{6})\.pdf$")
+_TEMP_SUFFIX = ".tmp"
+
+StoredFile = namedtuple("StoredFile", ["name", "size", "mtime"])
+
+
+def subject_of(name):
+    """Subject part of a generated PDF name, or None for other files"""
+    match = _OUTPUT_NAME_RE.match(name)
+    return match.group(1) if match else None
+
+
+@contextmanager
+def atomic_write(path, mode="wb", encoding=None):
+    """File opened for writing that replaces path only once the block completes
+
+    Data goes to a unique, dot-prefixed temp file beside path (concurrent writers
+    never share one, and directory scans skip it), is fsynced, then renamed into
+    place. On any error the temp file is removed and path is left untouched.
+    """
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex}{_TEMP_SUFFIX}")
+    f = open(tmp_path, mode, encoding=encoding)
+    try:
+        yield f
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        f.close()
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class StorageBackend:
+    """Where generated PDFs live
+
+    A backend stores whole objects by name. open_write must not make an object
+    visible under its final name until the write has completed.
+    """
+
+    def open_write(self, name):
+        """Context manager yielding a writable binary file for name"""
+        raise NotImplementedError
+
+    def stat(self, name):
+        """StoredFile for name, or None if it does not exist"""
+        raise NotImplementedError
+
+    def list(self):
+        """StoredFile for every stored object, including unfinished temp objects"""
+        raise NotImplementedError
+
+    def delete(self, name):
+        raise NotImplementedError
+
+    def local_path(self, name):
+        """Filesystem path that can be served directly, or None"""
+        return None
+
+    def exists(self, name):
+        return self.stat(name) is not None
+
+
+class LocalDirectoryBackend(StorageBackend):
+    """Objects as files in one directory, written to a temp file and renamed into place"""
+
+    def __init__(self, directory=OUTPUT_DIR):
+        self.directory = directory
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def open_write(self, name):
+        os.makedirs(self.directory, exist_ok=True)
+        return atomic_write(self.path(name))
+
+    def stat(self, name):
+        try:
+            stat = os.stat(self.path(name))
+        except FileNotFoundError:
+            return None
+        return StoredFile(name, stat.st_size, stat.st_mtime)
+
+    def list(self):
+        files = []
+        try:
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    if item.is_file():
+                        stat = item.stat()
+                        files.append(StoredFile(item.name, stat.st_size, stat.st_mtime))
+        except FileNotFoundError:
+            pass
+        return files
+
+    def delete(self, name):
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, name):
+        if safe_output_path(self.directory, name) is None:
+            return None
+        return self.path(name)
+
+
+class StorageManager:
+    """Generated PDF storage shared by both generators and the API
+
+    Retention runs on a background thread: expired PDFs go first, then the least
+    recently used PDFs of any subject over its quota, then the least recently used
+    overall until the total fits in max_bytes. Other components report access
+    times and learn about deletions through register().
+    """
+
+    def __init__(self, backend, max_bytes=STORAGE_MAX_BYTES, max_age=STORAGE_MAX_AGE,
+                 subject_max_bytes=SUBJECT_MAX_BYTES, sweep_interval=SWEEP_INTERVAL):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.subject_max_bytes = subject_max_bytes
+        self.sweep_interval = sweep_interval
+        self.sweeps = 0
+        self.deleted = 0
+        self._access_sources = []
+        self._delete_listeners = []
+        self._sweep_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, access_times=None, on_delete=None):
+        """access_times() -> {name: last access}; on_delete(names) after a sweep removes files"""
+        if access_times is not None:
+            self._access_sources.append(access_times)
+        if on_delete is not None:
+            self._delete_listeners.append(on_delete)
+
+    @contextmanager
+    def writer(self, name, in_memory=False):
+        """Writable target for a PDF: a BytesIO when in_memory, else an atomic backend write"""
+        if in_memory:
+            yield io.BytesIO()
+            return
+        with self.backend.open_write(name) as f:
+            yield f
+
+    def path(self, name):
+        return self.backend.local_path(name)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def stat(self, name):
+        return self.backend.stat(name)
+
+    def sweep(self, now=None):
+        """Apply age, per-subject and total size limits; returns the deleted names"""
+        with self._sweep_lock:
+            now = time.time() if now is None else now
+            last_access = {}
+            for source in self._access_sources:
+                for name, accessed in source().items():
+                    last_access[name] = max(accessed, last_access.get(name, 0))
+
+            doomed = []
+            pdfs = []
+            for item in self.backend.list():
+                if item.name.startswith(".") and item.name.endswith(_TEMP_SUFFIX):
+                    if now - item.mtime > TEMP_MAX_AGE:
+                        doomed.append(item.name)
+                    continue
+                subject = subject_of(item.name)
+                if subject is None:
+                    continue
+                accessed = max(item.mtime, last_access.get(item.name, 0))
+                if now - accessed > self.max_age:
+                    doomed.append(item.name)
+                else:
+                    pdfs.append((accessed, item.name, item.size, subject))
+            pdfs.sort()
+
+            kept = []
+            if self.subject_max_bytes:
+                subject_bytes = defaultdict(int)
+                for _, _, size, subject in pdfs:
+                    subject_bytes[subject] += size
+                for entry in pdfs:
+                    _, name, size, subject = entry
+                    if subject_bytes[subject] > self.subject_max_bytes:
+                        subject_bytes[subject] -= size
+                        doomed.append(name)
+                    else:
+                        kept.append(entry)
+            else:
+                kept = pdfs
+
+            total_bytes = sum(size for _, _, size, _ in kept)
+            for _, name, size, _ in kept:
+                if total_bytes <= self.max_bytes:
+                    break
+                total_bytes -= size
+                doomed.append(name)
+
+            for name in doomed:
+                self.backend.delete(name)
+            self.sweeps += 1
+            self.deleted += len(doomed)
+
+        if doomed:
+            for listener in self._delete_listeners:
+                listener(doomed)
+        return doomed
+
+    def request_sweep(self):
+        """Wake the sweeper early, e.g. after a large write"""
+        self._wake.set()
+
+    def _sweep_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.sweep_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.sweep()
+            except OSError:
+                pass
+
+    def start(self):
+        """Start the background sweeper (once per API process)"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sweep_loop, name="storage-sweeper", daemon=True)
+            self._thread.start()
+            self.request_sweep()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self):
+        pdfs = [item for item in self.backend.list() if subject_of(item.name) is not None]
+        return {
+            "files": len(pdfs),
+            "bytes": sum(item.size for item in pdfs),
+            "max_bytes": self.max_bytes,
+            "max_age": self.max_age,
+            "subject_max_bytes": self.subject_max_bytes,
+            "sweep_interval": self.sweep_interval,
+            "sweeps": self.sweeps,
+            "deleted": self.deleted,
+        }
+
+
+# Shared storage: generators write through it, the API process runs its sweeper
+output_storage = StorageManager(LocalDirectoryBackend(OUTPUT_DIR))
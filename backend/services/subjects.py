@@ -0,0 +1,242 @@
+"""
+Subject Registry
+Resolves requested subjects by id or name and keeps recently used subjects loaded
+"""
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from data.demo_textbook import QUANTUM_PHYSICS_TEXTBOOK, MACHINE_LEARNING_TEXTBOOK, DEMO_QUESTIONS
+from services.corpus import compiled_textbook
+from services.question_banks import load_question_bank
+from services.textbook_ingest import open_textbook
+
+# Registry configuration (override through environment variables)
+SUBJECT_CACHE_BYTES = int(os.getenv("ACADINTEL_SUBJECT_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+_KEY_RE = re.compile(r"[^0-9a-z]+")
+
+
+class UnknownSubjectError(LookupError):
+    """Raised when neither the subject id nor the subject name is registered"""
+
+
+def subject_key(name):
+    """Lookup key for a subject name: case, punctuation and spacing are ignored"""
+    return " ".join(_KEY_RE.sub(" ", name.lower()).split())
+
+
+class Subject:
+    """A registered subject; its textbook and questions are loaded on first use
+
+    load_questions returns the built-in questions; uploaded question banks are
+    added on top of them when the subject loads.
+    """
+
+    def __init__(self, subject_id, name, load_textbook, load_questions, aliases=()):
+        self.subject_id = subject_id
+        self.name = name
+        self.aliases = tuple(aliases)
+        self.load_textbook = load_textbook
+        self.load_questions = load_questions
+
+    def to_dict(self):
+        return {"subject_id": self.subject_id, "name": self.name, "aliases": list(self.aliases)}
+
+
+class LoadedSubject:
+    """Generation-ready data of a subject: compiled textbook and question bank"""
+
+    def __init__(self, subject, textbook, bank):
+        self.subject = subject
+        self.textbook = textbook
+        self.bank = bank
+        self._textbook_bytes = textbook_size(textbook)
+        self.size = self.measure()
+
+    @property
+    def questions(self):
+        """Annotated questions (a snapshot; uploads replace rather than mutate it)"""
+        return self.bank.questions
+
+    def measure(self):
+        return self._textbook_bytes + self.bank.size
+
+
+def textbook_size(textbook):
+    """Approximate resident bytes of a textbook
+
+    A compiled textbook counts as its file size (its pages may all be mapped in);
+    a dict counts as its JSON encoding, a fair proxy for small dicts of strings.
+    Question banks keep their own running estimate the same way.
+    """
+    path = getattr(textbook, "path", None)
+    if path is not None:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+    return len(json.dumps(textbook, ensure_ascii=False, default=str))
+
+
+class SubjectRegistry:
+    """Subjects by id, exact name and normalized name, with an LRU of loaded subjects
+
+    Lookups are dict hits in that order. Loaded subjects stay in memory until the
+    estimated total exceeds max_bytes, then the least recently used are dropped;
+    the most recent one is always kept, however large.
+    """
+
+    def __init__(self, max_bytes=SUBJECT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+        self._by_id = {}
+        self._by_name = {}
+        self._by_key = {}
+        self._loaded = OrderedDict()
+        self._loaded_bytes = 0
+        self._lock = threading.RLock()
+
+    def register(self, subject_id, name, load_textbook, load_questions, aliases=()):
+        """Add a subject (or replace one with the same id); names already taken keep their subject"""
+        subject = Subject(subject_id, name, load_textbook, load_questions, aliases)
+        with self._lock:
+            if subject_id in self._by_id:
+                self.unregister(subject_id)
+            self._by_id[subject_id] = subject
+            for label in (name,) + subject.aliases:
+                self._by_name.setdefault(label, subject)
+                self._by_key.setdefault(subject_key(label), subject)
+        return subject
+
+    def unregister(self, subject_id):
+        with self._lock:
+            subject = self._by_id.pop(subject_id, None)
+            if subject is None:
+                return
+            for index in (self._by_name, self._by_key):
+                for label in [label for label, value in index.items() if value is subject]:
+                    del index[label]
+            self._drop(subject_id)
+
+    def resolve(self, subject_id=None, subject_name=None):
+        """Registered subject for an id or name
+
+        Clients may send ids of their own (the frontend numbers its subjects), so
+        an unknown id falls through to the name.
+        """
+        subject = self._by_id.get(subject_id) if subject_id else None
+        if subject is None and subject_name:
+            subject = self._by_name.get(subject_name) or self._by_key.get(subject_key(subject_name))
+        if subject is None:
+            raise UnknownSubjectError(f"Unknown subject: {subject_name or subject_id or '(none)'}")
+        return subject
+
+    def load(self, subject):
+        """LoadedSubject for a subject, loading it on first use"""
+        with self._lock:
+            loaded = self._loaded.get(subject.subject_id)
+            if loaded is not None and loaded.subject is subject:
+                self._loaded.move_to_end(subject.subject_id)
+                self.hits += 1
+                return loaded
+
+        # Loading may read and compile a textbook; other subjects stay available meanwhile
+        loaded = LoadedSubject(
+            subject,
+            compiled_textbook(subject.load_textbook()),
+            load_question_bank(subject.subject_id, subject.load_questions())
+        )
+        with self._lock:
+            if self._by_id.get(subject.subject_id) is not subject:
+                return loaded  # replaced while loading; do not cache stale data
+            self._drop(subject.subject_id)
+            self._loaded[subject.subject_id] = loaded
+            self._loaded_bytes += loaded.size
+            self.loads += 1
+            self._evict()
+        return loaded
+
+    def resized(self, subject_id):
+        """Re-measure a loaded subject after its question bank grew"""
+        with self._lock:
+            loaded = self._loaded.get(subject_id)
+            if loaded is None:
+                return
+            size = loaded.measure()
+            self._loaded_bytes += size - loaded.size
+            loaded.size = size
+            self._loaded.move_to_end(subject_id)
+            self._evict()
+
+    def _evict(self):
+        while self._loaded_bytes > self.max_bytes and len(self._loaded) > 1:
+            _, evicted = self._loaded.popitem(last=False)
+            self._loaded_bytes -= evicted.size
+            self.evictions += 1
+
+    def get(self, subject_id=None, subject_name=None):
+        """Resolve and load a subject in one call"""
+        return self.load(self.resolve(subject_id, subject_name))
+
+    def invalidate(self, subject_id):
+        """Forget a subject's loaded data so the next use reloads it"""
+        with self._lock:
+            self._drop(subject_id)
+
+    def _drop(self, subject_id):
+        loaded = self._loaded.pop(subject_id, None)
+        if loaded is not None:
+            self._loaded_bytes -= loaded.size
+
+    def subjects(self):
+        with self._lock:
+            return [subject.to_dict() for subject in self._by_id.values()]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subjects": len(self._by_id),
+                "loaded": list(self._loaded),
+                "loaded_bytes": self._loaded_bytes,
+                "max_bytes": self.max_bytes,
+                "loads": self.loads,
+                "hits": self.hits,
+                "evictions": self.evictions,
+            }
+
+
+def register_demo_subjects(registry):
+    registry.register(
+        "quantum-physics-i", "Quantum Physics I",
+        lambda: QUANTUM_PHYSICS_TEXTBOOK, lambda: DEMO_QUESTIONS["Quantum Physics I"],
+        aliases=("Quantum Physics",)
+    )
+    registry.register(
+        "machine-learning", "Machine Learning",
+        lambda: MACHINE_LEARNING_TEXTBOOK, lambda: DEMO_QUESTIONS["Machine Learning"],
+        aliases=("ML",)
+    )
+
+
+def register_textbook(registry, summary):
+    """Make an ingested textbook available as a subject (by its textbook id and title)"""
+    textbook_id = summary["textbook_id"]
+
+    def load_textbook():
+        textbook = open_textbook(textbook_id)
+        if textbook is None:
+            raise UnknownSubjectError(f"Textbook {textbook_id} is no longer available")
+        return textbook
+
+    return registry.register(textbook_id, summary["title"], load_textbook, list)
+
+
+# Shared registry: demo subjects now, ingested textbooks once the API starts
+subject_registry = SubjectRegistry()
+register_demo_subjects(subject_registry)
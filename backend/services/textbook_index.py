@@ -0,0 +1,230 @@
+"""
+Textbook Topic Index
+Precomputed lookup from question topics to textbook sections, shared by both generators
+"""
+
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+from services.memo import IdentityMemo
+
+GRAM_SIZE = 3
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+TOP_K = 3
+MIN_SCORE = 2.0  # best score below this counts as "not found in textbook"
+
+# Field weights: a term in the title or key terms counts as several occurrences
+TITLE_WEIGHT = 3
+KEY_TERM_WEIGHT = 2
+CONTENT_WEIGHT = 1
+
+# Query weights: topics describe the question better than its wording
+TOPIC_WEIGHT = 2.0
+TEXT_WEIGHT = 1.0
+
+# Bonus when a whole topic phrase appears in a section title
+TITLE_PHRASE_BONUS = 2.0
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+# Positional postings: token ordinal within its field, with the field in the top bits
+FIELD_SHIFT = 30
+FIELD_CONTENT = 0
+FIELD_KEY_TERMS = 1
+FIELD_TITLE = 2
+ORDINAL_MASK = (1 << FIELD_SHIFT) - 1
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how in into is it its of on or
+that the their this to what when where which why with
+compare define derive describe discuss explain give list provide show solve state
+example examples briefly detail
+""".split())
+
+# Built indexes per textbook object
+_indexes = IdentityMemo(slots=64)
+
+
+def _grams(text):
+    """Character trigrams of text"""
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords"""
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def section_term_positions(section):
+    """term -> sorted encoded positions of its occurrences in a section
+
+    Ordinals count every word, stopwords included, so phrase words keep their
+    distance; content ordinals are plain word offsets (field bits are zero).
+    Key terms are separated by a gap so a phrase never spans two of them.
+    """
+    positions = defaultdict(list)
+
+    def add(field, text, ordinal):
+        for match in TOKEN_RE.finditer(text):
+            token = match.group(0).lower()
+            if token not in STOPWORDS:
+                positions[token].append(field << FIELD_SHIFT | ordinal)
+            ordinal += 1
+        return ordinal
+
+    add(FIELD_TITLE, section['title'], 0)
+    ordinal = 0
+    for term in section.get('key_terms', []):
+        ordinal = add(FIELD_KEY_TERMS, term, ordinal) + 1
+    add(FIELD_CONTENT, section.get('content', ''), 0)
+    for occurrences in positions.values():
+        occurrences.sort()
+    return positions
+
+
+def question_query(question):
+    """Weighted query terms for a question: its topics plus its wording"""
+    query = Counter()
+    for topic in question.get('topics', []):
+        for token in tokenize(topic):
+            query[token] += TOPIC_WEIGHT
+    for token in tokenize(question.get('text', '')):
+        query[token] += TEXT_WEIGHT
+    return query
+
+
+class TextbookIndex:
+    """Search structures for one textbook
+
+    - a trigram index over section titles for topic phrase matching
+    - a BM25 index over section titles, key terms and content, stored as
+      precomputed impact postings (term -> [(section position, score)])
+    """
+
+    def __init__(self, textbook, impacts=None):
+        """impacts, if given, are prebuilt BM25 postings (e.g. from a compiled corpus)"""
+        self.textbook = textbook
+        self.sections = []  # (chapter, section) in reading order
+        self._titles = []
+        self._postings = defaultdict(set)  # trigram -> section positions
+        self._topic_matches = {}
+
+        term_freqs = []
+        for chapter in textbook.get('chapters', []):
+            for section in chapter.get('sections', []):
+                position = len(self.sections)
+                title = section['title'].lower()
+                self.sections.append((chapter, section))
+                self._titles.append(title)
+                for gram in _grams(title):
+                    self._postings[gram].add(position)
+                if impacts is None:
+                    term_freqs.append(self._section_terms(section))
+
+        self._impacts = impacts if impacts is not None else self._build_impacts(term_freqs)
+
+    @staticmethod
+    def _section_terms(section):
+        """Field-weighted term frequencies of a section"""
+        freqs = Counter()
+        for token in tokenize(section['title']):
+            freqs[token] += TITLE_WEIGHT
+        for term in section.get('key_terms', []):
+            for token in tokenize(term):
+                freqs[token] += KEY_TERM_WEIGHT
+        for token in tokenize(section.get('content', '')):
+            freqs[token] += CONTENT_WEIGHT
+        return freqs
+
+    @staticmethod
+    def _build_impacts(term_freqs):
+        """Precompute each (term, section) BM25 contribution"""
+        impacts = defaultdict(list)
+        if not term_freqs:
+            return impacts
+
+        lengths = [sum(freqs.values()) for freqs in term_freqs]
+        avg_length = sum(lengths) / len(lengths) or 1.0
+        doc_freq = Counter()
+        for freqs in term_freqs:
+            doc_freq.update(freqs.keys())
+
+        total = len(term_freqs)
+        for position, freqs in enumerate(term_freqs):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[position] / avg_length)
+            for term, tf in freqs.items():
+                idf = math.log(1 + (total - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+                impacts[term].append((position, idf * tf * (BM25_K1 + 1) / (tf + norm)))
+        return impacts
+
+    def first_match(self, topic):
+        """Position of the first section whose title contains topic (lowercase), or None"""
+        if topic in self._topic_matches:
+            return self._topic_matches[topic]
+
+        if len(topic) < GRAM_SIZE:
+            candidates = range(len(self._titles))
+        else:
+            gram_postings = sorted((self._postings.get(gram, ()) for gram in _grams(topic)), key=len)
+            candidates = set(gram_postings[0]).intersection(*gram_postings[1:])
+
+        position = min((pos for pos in candidates if topic in self._titles[pos]), default=None)
+        self._topic_matches[topic] = position
+        return position
+
+    def rank(self, questions, k=TOP_K):
+        """Top-k (score, position) pairs per question, best first
+
+        All queries are scored in one term-at-a-time pass, so each posting list
+        is read once for the whole question list.
+        """
+        scores = [defaultdict(float) for _ in questions]
+        queries_by_term = defaultdict(list)
+        for qi, question in enumerate(questions):
+            for term, weight in question_query(question).items():
+                queries_by_term[term].append((qi, weight))
+
+        for term, users in queries_by_term.items():
+            postings = self._impacts.get(term)
+            if not postings:
+                continue
+            for qi, weight in users:
+                accumulator = scores[qi]
+                for position, impact in postings:
+                    accumulator[position] += weight * impact
+
+        # Whole topic phrases found in a title outrank scattered word hits
+        for qi, question in enumerate(questions):
+            for topic in question.get('topics', []):
+                if not topic.strip():
+                    continue
+                position = self.first_match(topic.lower())
+                if position is not None:
+                    scores[qi][position] += TITLE_PHRASE_BONUS
+
+        # Ties go to the section that comes first in the book
+        return [
+            [(round(score, 4), position) for position, score in
+             heapq.nsmallest(k, accumulator.items(), key=lambda item: (-item[1], item[0]))]
+            for accumulator in scores
+        ]
+
+    def best_section(self, ranking):
+        """(chapter, section, score) for the top hit of a rank() entry, or None below MIN_SCORE"""
+        if not ranking or ranking[0][0] < MIN_SCORE:
+            return None
+        score, position = ranking[0]
+        chapter, section = self.sections[position]
+        return chapter, section, score
+
+
+def get_textbook_index(textbook):
+    """Index for a textbook, built once per textbook object and reused"""
+    return _indexes.get(textbook, lambda textbook: TextbookIndex(
+        textbook, getattr(textbook, "bm25_impacts", None)
+    ))
@@ -0,0 +1,321 @@
+"""
+Textbook Ingestion
+Extracts a textbook PDF page by page across worker processes and segments it into
+the chapter/section structure the generators use
+"""
+
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+
+from PyPDF2 import PdfReader
+
+from services.corpus import compile_corpus, open_or_compile, CORPUS_SUFFIX
+from services.storage import atomic_write
+from services.textbook_index import tokenize
+from services.worker_pool import nested_pool, REQUESTED_NESTED_WORKERS
+
+# Ingestion configuration (override through environment variables)
+TEXTBOOK_DIR = os.getenv("ACADINTEL_TEXTBOOK_DIR", "textbooks")
+# Extraction runs inside a generation worker; an upload is an explicit request, so it gets
+# that worker's CPU share but never less than two processes
+INGEST_WORKERS = int(os.getenv("ACADINTEL_INGEST_WORKERS", str(REQUESTED_NESTED_WORKERS)))
+PAGE_BATCH = int(os.getenv("ACADINTEL_INGEST_PAGE_BATCH", "25"))
+
+KEY_TERMS_PER_SECTION = 5
+FALLBACK_SECTION_PAGES = 10  # books without chapter headings are split into page runs
+
+_CHAPTER_RE = re.compile(r"^chapter\s+(\d+|[ivxlcdm]+)\b[\s.:\-–—]*(.*)$", re.IGNORECASE)
+_SECTION_RE = re.compile(r"^(\d+)\.(\d+)\.?\s+([A-Z].{2,79})$")
+_TOC_LINE_RE = re.compile(r"(\.\s*){3,}\d*$|\s{2,}\d+$")  # dot leaders / page numbers
+_PAGE_NUMBER_RE = re.compile(r"^\d+$")
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+_ROMAN = {"i": 1, "v": 5, "x": 10, "l": 50, "c": 100, "d": 500, "m": 1000}
+
+
+def _roman_to_int(numeral):
+    total = 0
+    for current, following in zip(numeral, numeral[1:] + " "):
+        value = _ROMAN[current]
+        total += -value if _ROMAN.get(following, 0) > value else value
+    return total
+
+
+def textbook_id_for(title, content_hash):
+    """Stable id: title slug plus the start of the PDF's content hash"""
+    slug = _SLUG_RE.sub("-", title.lower()).strip("-")[:48] or "textbook"
+    return f"{slug}-{content_hash[:12]}"
+
+
+def _extract_pages(pdf_path, start, stop):
+    """Worker entry point: text of pages start..stop-1 as (page number, text) pairs
+
+    Each batch opens its own reader, so a worker only ever holds the objects of
+    the pages it is extracting.
+    """
+    reader = PdfReader(pdf_path)
+    pages = []
+    for index in range(start, stop):
+        try:
+            text = reader.pages[index].extract_text() or ""
+        except Exception:
+            text = ""  # one unreadable page should not fail the book
+        pages.append((index + 1, text))
+    return pages
+
+
+def iter_page_texts(pdf_path, workers=INGEST_WORKERS, batch_size=PAGE_BATCH, progress_callback=None):
+    """Yield (page number, text) for every page, in order
+
+    Batches are extracted in a process pool with at most two batches per worker
+    outstanding, so memory stays bounded however long the book is.
+    """
+    total = len(PdfReader(pdf_path).pages)
+    batches = [(start, min(start + batch_size, total)) for start in range(0, total, batch_size)]
+
+    if workers <= 1 or len(batches) <= 1:
+        for start, stop in batches:
+            yield from _extract_pages(pdf_path, start, stop)
+            if progress_callback:
+                progress_callback(stop, total, f"Extracted page {stop} of {total}")
+        return
+
+    window = workers * 2
+    with nested_pool(min(workers, len(batches))) as executor:
+        pending = {}
+        submitted = 0
+        for start, stop in batches:
+            while submitted < len(batches) and len(pending) < window:
+                batch_start, batch_stop = batches[submitted]
+                pending[batch_start] = executor.submit(_extract_pages, pdf_path, batch_start, batch_stop)
+                submitted += 1
+            yield from pending.pop(start).result()
+            if progress_callback:
+                progress_callback(stop, total, f"Extracted page {stop} of {total}")
+
+
+class TextbookSegmenter:
+    """Builds the textbook structure from page text fed in reading order
+
+    Chapters start at "Chapter N" headings and sections at "N.M Title" headings
+    that belong to the current chapter. Running headers that repeat the current
+    chapter heading and table-of-contents lines with dot leaders are ignored.
+    """
+
+    def __init__(self, title, author="", isbn="", edition=""):
+        self.textbook = {
+            "title": title,
+            "author": author,
+            "isbn": isbn,
+            "edition": edition,
+            "chapters": [],
+        }
+        self.pages = 0
+        self._chapter = None
+        self._section = None
+        self._awaiting_title = False
+        self._front_pages = []  # (page, lines) before the first chapter heading
+        self._term_counts = []  # (section, Counter) for key term selection
+        self._document_frequency = Counter()
+
+    def feed(self, page_number, text):
+        self.pages = max(self.pages, page_number)
+        lines = [line.strip() for line in text.splitlines()]
+        lines = [line for line in lines if line and not _PAGE_NUMBER_RE.match(line)]
+        if self._chapter is None:
+            self._front_pages.append((page_number, []))
+        for line in lines:
+            self._feed_line(page_number, line)
+
+    def _feed_line(self, page_number, line):
+        chapter = _CHAPTER_RE.match(line)
+        if chapter and not _TOC_LINE_RE.search(line):
+            number = chapter.group(1)
+            number = int(number) if number.isdigit() else _roman_to_int(number.lower())
+            current = self._chapter["number"] if self._chapter else 0
+            if number == current:
+                return  # running header
+            if number > current:
+                self._start_chapter(number, chapter.group(2).strip(), page_number)
+                return
+
+        if self._chapter is None:
+            self._front_pages[-1][1].append(line)
+            return
+
+        if self._awaiting_title:
+            self._awaiting_title = False
+            if len(line) <= 80 and not _SECTION_RE.match(line):
+                self._chapter["title"] = line
+                return
+
+        section = _SECTION_RE.match(line)
+        if (section and int(section.group(1)) == self._chapter["number"]
+                and not _TOC_LINE_RE.search(line)):
+            self._start_section(section.group(3).strip(), page_number)
+            return
+
+        if self._section is None:
+            self._start_section(self._chapter["title"], page_number)
+        self._section["lines"].append(line)
+
+    def _start_chapter(self, number, title, page_number):
+        self._close_section()
+        self._chapter = {"number": number, "title": title or f"Chapter {number}", "sections": []}
+        self._awaiting_title = not title
+        self.textbook["chapters"].append(self._chapter)
+
+    def _start_section(self, title, page_number):
+        self._close_section()
+        self._section = {"title": title, "lines": [], "page": page_number}
+
+    def _close_section(self):
+        section, self._section = self._section, None
+        if section is None or not section["lines"]:
+            return
+        content = "\n".join(section.pop("lines"))
+        # Re-join words hyphenated across line breaks
+        content = re.sub(r"(\w)-\n(\w)", r"\1\2", content)
+        section["content"] = content
+        section["key_terms"] = []
+        self._chapter["sections"].append(section)
+
+        counts = Counter(token for token in tokenize(content) if len(token) > 2 and not token.isdigit())
+        self._term_counts.append((section, counts))
+        self._document_frequency.update(counts.keys())
+
+    def _fallback_chapter(self):
+        """One chapter of fixed page runs for books without chapter headings"""
+        self._chapter = {"number": 1, "title": self.textbook["title"], "sections": []}
+        self.textbook["chapters"].append(self._chapter)
+        for page_number, lines in self._front_pages:
+            if (page_number - 1) % FALLBACK_SECTION_PAGES == 0:
+                last = min(page_number + FALLBACK_SECTION_PAGES - 1, self.pages)
+                self._start_section(f"Pages {page_number}-{last}", page_number)
+            if self._section is None:
+                self._start_section(f"Pages {page_number}", page_number)
+            self._section["lines"].extend(lines)
+
+    def finish(self):
+        """Close the last section, choose key terms and return the textbook"""
+        self._close_section()
+        if not self.textbook["chapters"]:
+            self._fallback_chapter()
+            self._close_section()
+        self._front_pages = []
+        self.textbook["chapters"] = [chapter for chapter in self.textbook["chapters"] if chapter["sections"]]
+
+        # Key terms: the section's most distinctive words (tf-idf)
+        sections = len(self._term_counts)
+        for section, counts in self._term_counts:
+            scored = [(count * math.log(1 + sections / self._document_frequency[token]), token)
+                      for token, count in counts.items()]
+            scored.sort(key=lambda item: (-item[0], item[1]))
+            section["key_terms"] = [token for _, token in scored[:KEY_TERMS_PER_SECTION]]
+        self._term_counts = []
+        return self.textbook
+
+
+def _write_json(path, value):
+    """Write JSON so readers only ever see the old or the complete new file"""
+    with atomic_write(path, "w", encoding="utf-8") as f:
+        json.dump(value, f, ensure_ascii=False)
+
+
+def textbook_summary(textbook_id, textbook, pages):
+    return {
+        "textbook_id": textbook_id,
+        "title": textbook["title"],
+        "author": textbook["author"],
+        "pages": pages,
+        "chapters": len(textbook["chapters"]),
+        "sections": sum(len(chapter["sections"]) for chapter in textbook["chapters"]),
+    }
+
+
+def save_textbook(textbook_id, textbook, summary):
+    """Persist a textbook, its compiled corpus and its summary under TEXTBOOK_DIR"""
+    os.makedirs(TEXTBOOK_DIR, exist_ok=True)
+    _write_json(os.path.join(TEXTBOOK_DIR, f"{textbook_id}.json"), textbook)
+    compile_corpus(textbook, os.path.join(TEXTBOOK_DIR, f"{textbook_id}{CORPUS_SUFFIX}"))
+    # Written last: a summary on disk means the textbook is complete
+    _write_json(os.path.join(TEXTBOOK_DIR, f"{textbook_id}.summary.json"), summary)
+
+
+def _valid_id(textbook_id):
+    return bool(textbook_id) and _SLUG_RE.sub("-", textbook_id) == textbook_id
+
+
+def load_textbook(textbook_id):
+    """Stored textbook, or None if it has not been ingested"""
+    if load_summary(textbook_id) is None:
+        return None
+    with open(os.path.join(TEXTBOOK_DIR, f"{textbook_id}.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def open_textbook(textbook_id):
+    """Memory-mapped corpus of an ingested textbook, or None if it has not been ingested"""
+    if load_summary(textbook_id) is None:
+        return None
+    # Compiled by an older version (or missing): recompile from the stored JSON
+    path = os.path.join(TEXTBOOK_DIR, f"{textbook_id}{CORPUS_SUFFIX}")
+    return open_or_compile(path, lambda: load_textbook(textbook_id))
+
+
+def load_summary(textbook_id):
+    """Stored textbook summary, or None if it has not been ingested"""
+    if not _valid_id(textbook_id):
+        return None
+    try:
+        with open(os.path.join(TEXTBOOK_DIR, f"{textbook_id}.summary.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def list_textbooks():
+    """Summaries of every ingested textbook"""
+    summaries = []
+    try:
+        names = sorted(os.listdir(TEXTBOOK_DIR))
+    except FileNotFoundError:
+        return summaries
+    for name in names:
+        if name.endswith(".summary.json"):
+            summary = load_summary(name[:-len(".summary.json")])
+            if summary is not None:
+                summaries.append(summary)
+    return summaries
+
+
+def ingest_textbook(pdf_path, textbook_id, title, author="", isbn="", edition="",
+                    progress_callback=None, remove_source=False):
+    """Extract, segment and persist a textbook PDF; returns its summary
+
+    progress_callback, if given, is called as progress_callback(done, total, message)
+    after each batch of pages. remove_source deletes pdf_path afterwards (uploads).
+    """
+    start_time = time.time()
+    try:
+        segmenter = TextbookSegmenter(title, author, isbn, edition)
+        for page_number, text in iter_page_texts(pdf_path, progress_callback=progress_callback):
+            segmenter.feed(page_number, text)
+        textbook = segmenter.finish()
+        textbook["id"] = textbook_id
+
+        if progress_callback:
+            progress_callback(segmenter.pages, segmenter.pages, "Saving textbook")
+        summary = textbook_summary(textbook_id, textbook, segmenter.pages)
+        save_textbook(textbook_id, textbook, summary)
+    finally:
+        if remove_source:
+            try:
+                os.remove(pdf_path)
+            except OSError:
+                pass
+
+    return dict(summary, ingestion_time=round(time.time() - start_time, 2))
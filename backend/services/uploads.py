@@ -0,0 +1,143 @@
+"""
+Streaming Uploads
+multipart/form-data parsed as the request body arrives, with the file part piped to a worker thread
+"""
+
+import asyncio
+import io
+
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+
+PIPE_CHUNKS = 16  # body chunks buffered between the request and the reading thread
+MAX_FIELD_BYTES = 64 * 1024
+
+
+class UploadError(ValueError):
+    """Raised for a body that is not usable multipart/form-data"""
+
+
+def multipart_boundary(content_type):
+    """Boundary of a multipart/form-data Content-Type header"""
+    media_type, options = parse_options_header(content_type or "")
+    if media_type != b"multipart/form-data" or b"boundary" not in options:
+        raise UploadError("Expected a multipart/form-data body")
+    return options[b"boundary"]
+
+
+class MultipartStream:
+    """Incremental multipart/form-data parser
+
+    feed(chunk) returns the events completed by that chunk:
+    ("field", name, value) for form fields, and ("file", name, filename),
+    ("data", bytes) ... ("end",) for file parts. Nothing is spooled.
+    """
+
+    def __init__(self, boundary):
+        self._events = []
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._part = None  # (name, filename or None)
+        self._field = bytearray()
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def feed(self, chunk):
+        self._events = []
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError as e:
+            raise UploadError(f"Malformed multipart body: {e}")
+        return self._events
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._field = bytearray()
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        self._part = (name, None if filename is None else filename.decode("utf-8", "replace"))
+        if filename is not None:
+            self._events.append(("file", *self._part))
+
+    def _on_part_data(self, data, start, end):
+        if self._part[1] is not None:
+            self._events.append(("data", data[start:end]))
+            return
+        self._field += data[start:end]
+        if len(self._field) > MAX_FIELD_BYTES:
+            raise UploadError(f"Form field {self._part[0]!r} is too large")
+
+    def _on_part_end(self):
+        if self._part[1] is not None:
+            self._events.append(("end",))
+        else:
+            self._events.append(("field", self._part[0], self._field.decode("utf-8", "replace")))
+
+
+class BodyPipe(io.RawIOBase):
+    """Readable file fed from the event loop, for a reader in a threadpool thread
+
+    The loop awaits put(chunk) and then finish(); the thread reads as from any
+    binary file and blocks until data arrives. The bounded queue keeps a slow
+    reader from letting the body pile up in memory. reader is the task running
+    the thread: once it has finished (e.g. rejected the file) nothing more is queued.
+    """
+
+    def __init__(self, loop):
+        super().__init__()
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=PIPE_CHUNKS)
+        self._buffer = b""
+        self._eof = False
+        self.finished = False  # end of file sent
+
+    async def put(self, chunk, reader):
+        """Queue a chunk unless the reader has already finished"""
+        put = asyncio.ensure_future(self._queue.put(chunk))
+        await asyncio.wait({put, reader}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+
+    async def finish(self, reader):
+        """Send end of file (once)"""
+        if not self.finished:
+            self.finished = True
+            await self.put(None, reader)
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer:
+            if self._eof:
+                return 0
+            chunk = asyncio.run_coroutine_threadsafe(self._queue.get(), self._loop).result()
+            if chunk is None:
+                self._eof = True
+                return 0
+            self._buffer = chunk
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
@@ -0,0 +1,123 @@
+"""
+Generation Worker Pool
+Runs the synchronous PDF generators off the event loop on a bounded executor
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Pool configuration (override through environment variables)
+WORKER_MODE = os.getenv("ACADINTEL_WORKER_MODE", "process")  # "process" or "thread"
+MAX_WORKERS = int(os.getenv("ACADINTEL_WORKERS", str(os.cpu_count() or 2)))
+MAX_QUEUE = int(os.getenv("ACADINTEL_MAX_QUEUE", "32"))
+
+# Processes a single build may start for work of its own (notes chapters, page extraction).
+# Up to MAX_WORKERS builds run at once, so each gets an even share of the CPUs
+NESTED_WORKERS = max(1, (os.cpu_count() or 2) // max(1, MAX_WORKERS))
+# Work the caller explicitly asked to parallelise (parallel_chapters, uploads) still gets
+# two processes when the even share is one, or it would silently run serially
+REQUESTED_NESTED_WORKERS = max(2, NESTED_WORKERS)
+
+# Worker processes never fork the API process: its threadpool threads may hold a lock
+# (memos, corpus and file locks) at that moment, and the child would wait on it forever.
+# A forkserver starts children from a clean single-threaded process; spawn where there is none
+MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+class PoolSaturatedError(Exception):
+    """Raised when every worker is busy and the wait queue is full"""
+
+
+class WorkerCrashedError(Exception):
+    """Raised for builds lost because a worker process died (the pool is then replaced)"""
+
+
+class GenerationPool:
+    """Bounded executor for CPU-heavy PDF builds"""
+
+    def __init__(self, mode=WORKER_MODE, max_workers=MAX_WORKERS, max_queue=MAX_QUEUE):
+        if mode not in ("process", "thread"):
+            raise ValueError(f"Unknown worker mode: {mode}")
+        self.mode = mode
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = None
+        self._pending = 0
+        self.restarts = 0
+
+    def _get_executor(self):
+        """Create the executor on first use so importing main stays cheap"""
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=MP_CONTEXT)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="acadintel-gen")
+        return self._executor
+
+    @property
+    def capacity(self):
+        """Builds that may be running or waiting at once"""
+        return self.max_workers + self.max_queue
+
+    def stats(self):
+        """Current pool usage for monitoring"""
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "running": min(self._pending, self.max_workers),
+            "queued": max(0, self._pending - self.max_workers),
+            "restarts": self.restarts,
+        }
+
+    async def run(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) on the pool without blocking the event loop"""
+        if self._pending >= self.capacity:
+            raise PoolSaturatedError(
+                f"Generation queue is full ({self._pending} builds pending)"
+            )
+
+        executor = self._get_executor()
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+        except BrokenProcessPool as e:
+            # A dead worker (OOM kill, segfault) breaks the whole executor for good
+            self._replace(executor)
+            raise WorkerCrashedError(f"A generation worker died during the build: {e}")
+        finally:
+            self._pending -= 1
+
+    def _replace(self, broken):
+        """Drop a broken executor; the next build starts a fresh one
+
+        Every build in flight on it fails at once, but only the first replaces it.
+        """
+        if self._executor is broken:
+            self._executor = None
+            self.restarts += 1
+            broken.shutdown(wait=False)
+
+    def shutdown(self):
+        """Stop accepting work and release worker processes/threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+# Shared pool used by the API handlers
+generation_pool = GenerationPool()
+
+
+def nested_pool(max_workers):
+    """ProcessPoolExecutor for parallel work inside one build (started like the pool's workers)"""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=MP_CONTEXT)